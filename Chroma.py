@@ -1,31 +1,163 @@
-from chromadb.utils import embedding_functions
-import chromadb
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.core import StorageContext
 import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from embedding_cache import CachedEmbeddingFunction, EmbeddingCache, llama_index_embedding
+from util import lazy_import
+
+# chroma's limit for the default sqlite backend, used when the client cannot report its own
+DEFAULT_MAX_BATCH_SIZE = 5461
+
+# imported on first use, so importing this module stays cheap
+chromadb = lazy_import("chromadb")
+chroma_errors = lazy_import("chromadb.errors")
+embedding_functions = lazy_import("chromadb.utils.embedding_functions")
+llama_chroma = lazy_import("llama_index.vector_stores.chroma")
+llama_core = lazy_import("llama_index.core")
+
+def is_missing_collection_error(error: Exception) -> bool:
+    """
+    Whether ``error`` is chromadb's "collection does not exist": NotFoundError
+    or InvalidCollectionException in recent releases, a ValueError in older ones.
+    """
+    not_found = tuple(getattr(chroma_errors, name) for name in ("NotFoundError", "InvalidCollectionException")
+                      if hasattr(chroma_errors, name))
+    if not_found and isinstance(error, not_found):
+        return True
+    return isinstance(error, ValueError) and "does not exist" in str(error)
+
 
 class ChromaHandler:
-    def __init__(self, collection_name: str = "my_collection", model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, collection_name: str = "my_collection", model_name: str = "all-MiniLM-L6-v2",
+                 embedding_cache_dir: Optional[Union[str, Path]] = None, batch_size: int = 32):
+        """
+        :param collection_name: Chroma collection to read and write.
+        :param model_name: SentenceTransformer model used for every embedding.
+        :param embedding_cache_dir: Where computed document embeddings are kept, or None to always encode.
+        :param batch_size: Texts per encoder call.
+        """
         self.chroma_client = chromadb.PersistentClient(path=os.getenv('CHROMA_DB_PERSISTENT_STORAGE'))
         self.collection_name = collection_name
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+        self.model_name = model_name
+        self.batch_size = batch_size
+        # the raw encoder embeds queries; documents go through the cache when one is configured
+        self.encoder = embedding_functions.SentenceTransformerEmbeddingFunction(
             model_name=model_name
         )
+        self.embedding_function = self.encoder
+        if embedding_cache_dir is not None:
+            self.embedding_function = CachedEmbeddingFunction(
+                self.encoder, EmbeddingCache(embedding_cache_dir, model_name), batch_size=batch_size
+            )
+        # llama-index embeds nodes and questions through the same model as the collection
+        self.embed_model = llama_index_embedding(self.embedding_function, self.encoder, model_name, batch_size)
+        self._attach_collection()
+
+    def _attach_collection(self):
         self.collection = self.chroma_client.get_or_create_collection(name=self.collection_name, embedding_function=self.embedding_function)
-        self.vector_store = ChromaVectorStore(chroma_collection=self.collection)
-        self.storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
+        self.vector_store = llama_chroma.ChromaVectorStore(chroma_collection=self.collection)
+        self.storage_context = llama_core.StorageContext.from_defaults(vector_store=self.vector_store)
+
+    def count(self) -> int:
+        """
+        Returns the number of entries currently persisted in the collection.
+        """
+        return self.collection.count()
+
+    def reset_collection(self):
+        """
+        Drops every entry in the collection and re-attaches the vector store,
+        so a full rebuild does not stack duplicate nodes on top of old ones.
+        """
+        try:
+            self.chroma_client.delete_collection(name=self.collection_name)
+        except Exception as e:
+            # nothing to drop is fine; anything else (permissions, a locked store) must not leave stale vectors behind
+            if not is_missing_collection_error(e):
+                raise
+        self._attach_collection()
 
 
+    def max_batch_size(self) -> int:
+        """
+        Largest number of records the client accepts in one upsert or query.
+        """
+        if hasattr(self.chroma_client, "get_max_batch_size"):
+            return self.chroma_client.get_max_batch_size()
+        return getattr(self.chroma_client, "max_batch_size", DEFAULT_MAX_BATCH_SIZE)
+
+    def bulk_upsert(self, documents: List[str], ids: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+                    batch_size: Optional[int] = None) -> int:
+        """
+        Upserts any number of documents in chunks the client accepts. Each
+        chunk is embedded while the previous one is being written, so the
+        encoder and the database work at the same time.
+
+        :param documents: Texts to store.
+        :param ids: One ID per document.
+        :param metadatas: Optional metadata per document.
+        :param batch_size: Records per upsert, capped at the client's maximum.
+        :return: The number of documents written.
+        """
+        if len(ids) != len(documents) or (metadatas is not None and len(metadatas) != len(documents)):
+            raise ValueError("documents, ids and metadatas must have the same length")
+        batch_size = min(batch_size or self.max_batch_size(), self.max_batch_size())
+
+        pending = None
+        # one writer thread keeps upserts in order while the next chunk is encoded here
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for start in range(0, len(documents), batch_size):
+                end = start + batch_size
+                embeddings = self.embedding_function(documents[start:end])
+                if pending is not None:
+                    pending.result()
+                pending = writer.submit(
+                    self.collection.upsert,
+                    ids=ids[start:end],
+                    documents=documents[start:end],
+                    embeddings=embeddings,
+                    metadatas=metadatas[start:end] if metadatas is not None else None
+                )
+            if pending is not None:
+                pending.result()
+        return len(documents)
+
     def add_document(self, documents, ids):
-        self.collection.upsert(
-            documents = documents,
-            # metadatas = metadatas,
-            ids = ids
-        )
+        self.bulk_upsert(documents, ids)
+
+    def query_many(self, queries: List[str], n_results: int = 1,
+                   where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Runs several text queries with one encoder pass and as few collection
+        queries as the batch limit allows.
+
+        :param queries: The text queries.
+        :param n_results: Results per query.
+        :param where: Optional metadata filter applied to every query.
+        :return: One dict per query with its ids, documents, metadatas and distances.
+        """
+        if not queries:
+            return []
+        embeddings = self.encoder(list(queries))
+        results = []
+        batch_size = self.max_batch_size()
+        for start in range(0, len(queries), batch_size):
+            response = self.collection.query(
+                query_embeddings=embeddings[start:start + batch_size],
+                n_results=n_results,
+                where=where
+            )
+            for i in range(len(response["ids"])):
+                results.append({
+                    field: response[field][i] if response.get(field) is not None else None
+                    for field in ("ids", "documents", "metadatas", "distances")
+                })
+        return results
 
     def query_text_document(self, text, number = 1):
+        # queries are embedded by the raw encoder so one-off questions stay out of the document cache
         response = self.collection.query(
-            query_texts=[text],
+            query_embeddings=self.encoder([text]),
             n_results=number
         )
 
@@ -49,7 +181,7 @@ class ChromaHandler:
         :return: A dictionary containing the query results.
         """
         return self.collection.query(
-            query_texts=[query],
+            query_embeddings=self.encoder([query]),
             n_results=n_results
         )
     
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Union
+
+
+def audio_cache_key(text: str, voice: str, lang: str, speed: float, file_format: str) -> str:
+    """
+    Content address of a synthesized clip: everything that changes the audio
+    produced for ``text``.
+    """
+    payload = json.dumps([text, voice, lang, float(speed), file_format.lower()], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _link_or_copy(src: Union[str, Path], dst: Union[str, Path]):
+    # Remove first: dst may itself be a hard link to a cached clip, and writing through it would corrupt the cache
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem, or one without hard links
+        shutil.copyfile(src, dst)
+
+
+class AudioCache:
+    """
+    Disk cache of synthesized speech addressed by audio_cache_key. Clips live
+    in ``cache_dir`` as ``<key>.<format>`` and an SQLite index tracks their
+    sizes and last use, so the least recently used clips are evicted once the
+    cache grows past ``max_bytes``. Hits are hard-linked into place (copied
+    when the destination is on another filesystem), so files handed out by
+    the cache must be treated as read-only.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = 500 * 1024 * 1024):
+        """
+        :param cache_dir: Directory holding the clips and the index.
+        :param max_bytes: Maximum total size of the cached clips.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.cache_dir / "index.db"), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS clips ("
+            "key TEXT PRIMARY KEY, file TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS clips_accessed_at ON clips (accessed_at)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM clips").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+
+    def fetch(self, key: str, output_path: Union[str, Path]) -> bool:
+        """
+        Places the cached clip for ``key`` at ``output_path``.
+
+        :return: False on a miss, leaving ``output_path`` untouched.
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT file FROM clips WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return False
+            clip_path = self.cache_dir / row[0]
+            try:
+                _link_or_copy(clip_path, output_path)
+            except FileNotFoundError:
+                # Clip deleted behind our back; forget it
+                self._delete(key)
+                self.misses += 1
+                return False
+            self.conn.execute("UPDATE clips SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return True
+
+    def store(self, key: str, audio_path: Union[str, Path]):
+        """
+        Adds the clip at ``audio_path`` under ``key`` and evicts least recently used clips over the size cap.
+        """
+        audio_path = Path(audio_path)
+        file_name = f"{key}{audio_path.suffix.lower()}"
+        size = audio_path.stat().st_size
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        now = time.time()
+        with self.lock:
+            _link_or_copy(audio_path, self.cache_dir / file_name)
+            old = self.conn.execute("SELECT size FROM clips WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO clips (key, file, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, file_name, size, now, now)
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            self._evict()
+
+    def _delete(self, key: str):
+        row = self.conn.execute("SELECT file, size FROM clips WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return
+        self.conn.execute("DELETE FROM clips WHERE key = ?", (key,))
+        self.total_bytes -= row[1]
+        try:
+            os.remove(self.cache_dir / row[0])
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        if self.max_bytes is None or self.total_bytes <= self.max_bytes:
+            return
+        evicted = []
+        total_bytes = self.total_bytes
+        for key, size in self.conn.execute("SELECT key, size FROM clips ORDER BY accessed_at"):
+            if total_bytes <= self.max_bytes:
+                break
+            evicted.append(key)
+            total_bytes -= size
+        for key in evicted:
+            self._delete(key)
+        logging.info(f"Evicted {len(evicted)} clips from the audio cache")
+
+    def clear(self):
+        with self.lock:
+            for key, in self.conn.execute("SELECT key FROM clips").fetchall():
+                self._delete(key)
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            count = self.conn.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import pickle
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+
+from chunking import LINE_TYPES_KEY
+from metrics import LatencyStats
+
+STAGES = ["index", "retrieval", "llm", "asr", "tts"]
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a"}
+
+# vocabulary for the synthetic corpus: company-handbook pages with headings, lists, nested items and tables
+TOPICS = ["holiday policy", "expense claims", "onboarding", "security training", "client reporting",
+          "office access", "parental leave", "performance reviews", "travel booking", "data retention"]
+TEAMS = ["Finance", "Consulting", "Data", "Operations", "People", "Sales"]
+ASPECTS = ["eligibility", "approval process", "deadlines", "exceptions", "tools", "contacts", "budget", "examples"]
+WORDS = ("the team reviews each request within two working days and records the outcome in the shared tracker "
+         "managers approve exceptions after checking the project calendar and the remaining budget for the quarter "
+         "employees submit forms through the portal with receipts attached and a short description of the purpose "
+         "consultants working at a client site follow the client rules first and report any conflict to their lead "
+         "new colleagues get a buddy for the first month who introduces them to the tools and the weekly rituals").split()
+
+def sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 16))]
+    if rng.random() < 0.4:
+        words.insert(rng.randrange(len(words)), str(rng.randint(2, 40)))
+    return " ".join(words).capitalize() + "."
+
+def synthetic_page(rng, page_number, target_words):
+    # returns the page text in the notion reader's layout plus one structure code per line
+    topic = TOPICS[page_number % len(TOPICS)]
+    lines, types = [f"{rng.choice(TEAMS)} {topic} ({page_number})"], ["h1"]
+    words = 0
+    while words < target_words:
+        lines.append(f"{rng.choice(ASPECTS).capitalize()} for {topic}")
+        types.append("h2")
+        kind = rng.random()
+        if kind < 0.5:
+            block, block_types = [" ".join(sentence(rng) for _ in range(rng.randint(2, 5)))], ["p"]
+        elif kind < 0.8:
+            block, block_types = [], []
+            for _ in range(rng.randint(3, 6)):
+                block.append(sentence(rng))
+                block_types.append("li")
+                if rng.random() < 0.3:
+                    block.append("\t" + sentence(rng))
+                    block_types.append("li")
+        else:
+            block, block_types = ["Level | Days | Approver"], ["tr"]
+            for level in range(rng.randint(3, 6)):
+                block.append(f"Level {level + 1} | {rng.randint(1, 30)} | {rng.choice(TEAMS)} lead")
+                block_types.append("tr")
+        lines += block
+        types += block_types
+        words += sum(len(line.split()) for line in block)
+    return "\n".join(lines), types
+
+def synthetic_corpus(pages, words_per_page, seed=0):
+    from llama_index.core import Document
+    rng = random.Random(seed)
+    documents = []
+    for i in range(pages):
+        text, types = synthetic_page(rng, i, words_per_page)
+        page_id = f"synthetic-{i:05d}"
+        documents.append(Document(
+            text=text,
+            id_=page_id,
+            metadata={"page_id": page_id, LINE_TYPES_KEY: ",".join(types)},
+            excluded_embed_metadata_keys=[LINE_TYPES_KEY],
+            excluded_llm_metadata_keys=[LINE_TYPES_KEY]
+        ))
+    return documents
+
+def synthetic_questions(n, seed=0):
+    # every question normalizes differently, so none is answered from the response cache
+    rng = random.Random(seed + 1)
+    return [f"What is the {rng.choice(ASPECTS)} for {rng.choice(TOPICS)} in {rng.choice(TEAMS)}, case {i}?"
+            for i in range(n)]
+
+def fixture_audio(directory, durations, sample_rate=16000, seed=0):
+    # speech-like clips: voiced harmonics under a syllable-rate envelope with short pauses, as 16-bit wav
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    clips = []
+    for seconds in durations:
+        path = directory / f"fixture_{seconds:g}s.wav"
+        if not path.exists():
+            t = np.arange(int(seconds * sample_rate)) / sample_rate
+            pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+            phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+            voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+            envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.3 * t) > -0.7)
+            audio = 0.3 * voice * envelope + 0.01 * rng.standard_normal(len(t))
+            pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+            with wave.open(str(path), "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(sample_rate)
+                wav.writeframes(pcm.tobytes())
+        clips.append(path)
+    return clips
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on linux and bytes on macos
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def start_standin_server(args):
+    from llm_standin_server import StandinLLMHandler
+    StandinLLMHandler.latency = args.llm_latency
+    StandinLLMHandler.tokens_per_second = args.llm_tokens_per_second
+    StandinLLMHandler.response_tokens = args.llm_response_tokens
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandinLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def build_handler(args, workdir, name):
+    # an LLMHandler over the synthetic corpus; its index is built from the documents cache, so notion is never contacted
+    from llm_handler import LLMHandler
+
+    class SyntheticLLMHandler(LLMHandler):
+        def _notion_page_ids(self):
+            return [doc.metadata["page_id"] for doc in self.documents]
+
+    documents = synthetic_corpus(args.pages, args.words_per_page, args.seed)
+    cache_dir = workdir / name
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with open(cache_dir / "documents_cache.pkl", "wb") as f:
+        pickle.dump(documents, f)
+    with open(cache_dir / "embedding_cache.json", "w") as f:
+        json.dump({"page_ids": [doc.metadata["page_id"] for doc in documents], "timestamp": str(time.time())}, f)
+    return SyntheticLLMHandler(collection_name=name, cache_dir=str(cache_dir), warm_start=False,
+                               semantic_cache=False, llm_backend="openai-like")
+
+def timed(stats, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    stats.record(time.perf_counter() - start)
+    return result
+
+def bench_index(args, workdir, shared):
+    # cold builds: a fresh collection and embedding cache every repeat
+    stats = LatencyStats()
+    for repeat in range(args.index_repeats):
+        handler = build_handler(args, workdir, f"benchmark_index_{repeat}")
+        stats.record(handler.startup_timings["index"])
+        nodes = handler.chroma_db.count()
+    return stats, {"pages": args.pages, "words_per_page": args.words_per_page, "nodes": nodes}
+
+def get_handler(args, workdir, shared):
+    if "handler" not in shared:
+        shared["handler"] = build_handler(args, workdir, "benchmark")
+    return shared["handler"]
+
+def bench_retrieval(args, workdir, shared):
+    chroma_db = get_handler(args, workdir, shared).chroma_db
+    questions = synthetic_questions(args.queries, args.seed)
+    chroma_db.query_documents_by_text(questions[0], n_results=args.top_k)  # warm-up
+    stats = LatencyStats()
+    for question in questions:
+        timed(stats, chroma_db.query_documents_by_text, question, args.top_k)
+    return stats, {"top_k": args.top_k, "nodes": chroma_db.count()}
+
+def bench_llm(args, workdir, shared):
+    handler = get_handler(args, workdir, shared)
+    # fresh questions, so every call retrieves, builds the prompt and waits for the model
+    questions = synthetic_questions(args.queries + 1, args.seed + 100)
+    handler.ask_question(questions[0])  # warm-up
+    stats = LatencyStats()
+    for question in questions[1:]:
+        timed(stats, handler.ask_question, question)
+    return stats, {
+        "llm_url": os.environ["LLM_BASE_URL"],
+        "standin": None if args.llm_url else {
+            "latency": args.llm_latency,
+            "tokens_per_second": args.llm_tokens_per_second,
+            "response_tokens": args.llm_response_tokens,
+        },
+    }
+
+def get_communication(args, shared):
+    if "comm" not in shared:
+        from communication import Communication
+        # vad and the audio cache are off so only the models are measured
+        shared["comm"] = Communication(model_name=args.whisper_model, device="cpu", asr_backend=args.asr_backend,
+                                       tts_backend=args.tts_backend, vad=False, audio_cache_dir=None)
+    return shared["comm"]
+
+def clip_seconds(comm, path):
+    # wav lengths come from the header; other formats through the communication layer's decoder (16 khz mono)
+    if path.suffix.lower() == ".wav":
+        with wave.open(str(path), "rb") as f:
+            return f.getnframes() / f.getframerate()
+    return len(comm.decode_audio_bytes(path.read_bytes())) / 16000
+
+def bench_asr(args, workdir, shared):
+    audio_dir = Path(args.audio_dir) if args.audio_dir else None
+    if audio_dir is not None and audio_dir.is_dir():
+        clips = sorted(p for p in audio_dir.iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS)
+    else:
+        clips = fixture_audio(workdir / "fixtures", [3, 8, 15], seed=args.seed)
+    comm = get_communication(args, shared)
+    comm.transcribe_audio(clips[0])  # warm-up
+    stats = LatencyStats()
+    processing = 0.0
+    for _ in range(args.asr_repeats):
+        for clip in clips:
+            start = time.perf_counter()
+            comm.transcribe_audio(clip)
+            elapsed = time.perf_counter() - start
+            stats.record(elapsed)
+            processing += elapsed
+    audio_seconds = sum(clip_seconds(comm, clip) for clip in clips)
+    return stats, {
+        "model": args.whisper_model,
+        "backend": args.asr_backend,
+        "clips": [clip.name for clip in clips],
+        "audio_seconds": audio_seconds,
+        "rtf": processing / (audio_seconds * args.asr_repeats),
+    }
+
+def bench_tts(args, workdir, shared):
+    from llm_standin_server import standin_answer
+    comm = get_communication(args, shared)
+    output_dir = workdir / "tts"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # deterministic answer-like texts of one to three sentences
+    texts = ["".join(standin_answer(f"tts {i}", 12 * (1 + i % 3))) for i in range(args.tts_texts + 1)]
+    comm.text_to_speech(texts[0], output_dir / "warmup.mp3")
+    stats = LatencyStats()
+    failures = 0
+    for i, text in enumerate(texts[1:]):
+        start = time.perf_counter()
+        ok = comm.text_to_speech(text, output_dir / f"answer_{i}.mp3")
+        stats.record(time.perf_counter() - start)
+        failures += not ok
+    # gtts round-trips to google, so its latencies are not comparable with the offline backends
+    return stats, {"backend": args.tts_backend, "online": args.tts_backend == "gtts", "texts": args.tts_texts,
+                   "fallbacks": failures}
+
+BENCHMARKS = {
+    "index": bench_index,
+    "retrieval": bench_retrieval,
+    "llm": bench_llm,
+    "asr": bench_asr,
+    "tts": bench_tts,
+}
+
+def run_stages(args, stages, workdir):
+    shared = {}
+    results = {}
+    for stage in stages:
+        print(f"Running {stage}...", flush=True)
+        start = time.perf_counter()
+        try:
+            stats, extra = BENCHMARKS[stage](args, workdir, shared)
+        except Exception as e:
+            print(f"  {stage} failed: {e}")
+            results[stage] = {"error": str(e)}
+            continue
+        results[stage] = {
+            "latency": stats.summary(),
+            "seconds": time.perf_counter() - start,
+            # without --isolate this is the process peak so far, not the stage's own
+            "peak_rss_mb": peak_rss_mb(),
+            **extra,
+        }
+    return results
+
+def run_isolated(stage, workdir):
+    # reruns this script for one stage, so its peak rss and import costs are its own
+    output = workdir / f"{stage}.json"
+    subprocess.run([sys.executable, __file__, *sys.argv[1:], "--stages", stage, "--in-process",
+                    "--child-output", str(output), "--workdir", str(workdir)], check=False)
+    if not output.exists():
+        return {"error": "stage process failed"}
+    return json.loads(output.read_text())[stage]
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def print_results(results, baseline=None):
+    print(f"\n{'stage':<10} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'peak MB':>9}")
+    for stage, result in results.items():
+        if "error" in result:
+            print(f"{stage:<10} error: {result['error']}")
+            continue
+        latency = result["latency"]
+        line = (f"{stage:<10} {latency['count']:>5} {latency['p50_ms']:>10.1f} {latency['p95_ms']:>10.1f} "
+                f"{latency['p99_ms']:>10.1f} {result['peak_rss_mb']:>9.0f}")
+        previous = (baseline or {}).get(stage, {}).get("latency")
+        if previous and previous.get("p50_ms"):
+            line += f"   p50 {latency['p50_ms'] / previous['p50_ms'] - 1:+.1%}, p95 {latency['p95_ms'] / previous['p95_ms'] - 1:+.1%}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage latency benchmark: index build, retrieval, LLM, ASR and TTS')
+    parser.add_argument('--stages', type=str, default=",".join(STAGES), help=f'Comma-separated subset of {STAGES}')
+    parser.add_argument('--pages', type=int, default=50, help='Pages in the synthetic corpus')
+    parser.add_argument('--words-per-page', type=int, default=600, help='Approximate words per synthetic page')
+    parser.add_argument('--queries', type=int, default=50, help='Timed retrieval queries and LLM questions')
+    parser.add_argument('--top-k', type=int, default=2, help='Results per retrieval query')
+    parser.add_argument('--index-repeats', type=int, default=1, help='Cold index builds')
+    parser.add_argument('--llm-url', type=str, default=None,
+                        help='OpenAI-compatible endpoint to benchmark (default: an in-process stand-in server)')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Stand-in seconds to first token')
+    parser.add_argument('--llm-tokens-per-second', type=float, default=50.0, help='Stand-in generation rate')
+    parser.add_argument('--llm-response-tokens', type=int, default=64, help='Stand-in tokens per answer')
+    parser.add_argument('--audio-dir', type=str, default=None, help='Clips to transcribe (default: generated fixtures)')
+    parser.add_argument('--whisper-model', type=str, default='tiny', help='Whisper model name')
+    parser.add_argument('--asr-backend', type=str, default='whisper', help='ASR backend (see asr_backends.py)')
+    parser.add_argument('--asr-repeats', type=int, default=3, help='Timed passes over the clips')
+    parser.add_argument('--tts-backend', type=str, default='pyttsx3',
+                        help='TTS backend (see tts_backends.py); gtts measures network latency too')
+    parser.add_argument('--tts-texts', type=int, default=10, help='Timed answers to synthesize')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the corpus, questions and fixtures')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Results file (default: benchmark_results/benchmark_<timestamp>.json)')
+    parser.add_argument('--compare', type=str, default=None, help='Earlier results file to compare against')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Run every stage in this process (shares models; peak RSS becomes cumulative)')
+    parser.add_argument('--workdir', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--child-output', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown stages {unknown}; choose from {STAGES}")
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="rocky_benchmark_"))
+    # every collection and cache lives in the scratch directory, never in the real stores
+    os.environ["CHROMA_DB_PERSISTENT_STORAGE"] = str(workdir / "chroma")
+    if args.llm_url:
+        os.environ["LLM_BASE_URL"] = args.llm_url
+    elif "llm" in stages and (args.in_process or args.child_output):
+        os.environ["LLM_BASE_URL"] = start_standin_server(args)
+
+    if args.child_output:
+        results = run_stages(args, stages, workdir)
+        Path(args.child_output).write_text(json.dumps(results))
+        return
+
+    try:
+        if args.in_process:
+            results = run_stages(args, stages, workdir)
+        else:
+            results = {stage: run_isolated(stage, workdir) for stage in stages}
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "isolated": not args.in_process,
+        "args": {k: v for k, v in vars(args).items() if k not in ("workdir", "child_output", "compare", "output")},
+        "stages": results,
+    }
+    output = Path(args.output) if args.output else \
+        Path("benchmark_results") / f"benchmark_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    baseline = json.loads(Path(args.compare).read_text())["stages"] if args.compare else None
+    print_results(results, baseline)
+    print(f"\nResults saved to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+from asr_backends import ASR_BACKENDS
+from communication import Communication
+from semantic_cache import normalize_question
+from pathlib import Path
+import argparse
+import time
+import whisper
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a"}
+
+def word_edit_distance(reference, hypothesis):
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+def run(comm, clips, repeat):
+    # best of `repeat` runs per clip; returns transcripts and total processing seconds
+    texts, seconds = [], 0.0
+    for clip in clips:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = comm.transcribe_audio(clip)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        texts.append(result["text"].strip())
+        seconds += best
+    return texts, seconds
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ASR backends against the stock fp32 Whisper model')
+    parser.add_argument('--audio-dir', type=str, default='audio_tests', help='Directory with the clips to transcribe')
+    parser.add_argument('--model', type=str, default='tiny', help='Whisper model name')
+    parser.add_argument('--backend', type=str, default='whisper-int8', choices=list(ASR_BACKENDS),
+                        help='Backend to compare against the fp32 baseline')
+    parser.add_argument('--threads', type=int, default=None, help='Torch intra-op threads (default: torch decides)')
+    parser.add_argument('--language', type=str, default=None, help='Pin the decoding language (e.g. en)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per clip')
+    args = parser.parse_args()
+
+    clips = sorted(p for p in Path(args.audio_dir).iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS)
+    if not clips:
+        print(f"No audio clips found in {args.audio_dir}")
+        return
+    audio_seconds = sum(len(whisper.load_audio(str(clip))) for clip in clips) / whisper.audio.SAMPLE_RATE
+    print(f"Benchmarking {len(clips)} clips ({audio_seconds:.1f}s of audio), {args.repeat} runs per clip")
+
+    results = {}
+    for backend in ['whisper', args.backend]:
+        print(f"Loading '{args.model}' with backend {backend}...")
+        # vad and the audio cache are off so only the model is measured
+        comm = Communication(model_name=args.model, device='cpu', asr_backend=backend, asr_threads=args.threads,
+                             language=args.language, vad=False, audio_cache_dir=None)
+        comm.transcribe_audio(clips[0])  # warm-up
+        results[backend] = run(comm, clips, args.repeat)
+
+    baseline_texts, baseline_seconds = results['whisper']
+    texts, seconds = results[args.backend]
+    print(f"fp32 RTF:  {baseline_seconds / audio_seconds:.3f} ({baseline_seconds:.2f}s)")
+    print(f"{args.backend} RTF: {seconds / audio_seconds:.3f} ({seconds:.2f}s)")
+    print(f"Speedup: {baseline_seconds / seconds:.2f}x")
+
+    differing, edits, words = [], 0, 0
+    for clip, reference, hypothesis in zip(clips, baseline_texts, texts):
+        reference_words = normalize_question(reference).split()
+        hypothesis_words = normalize_question(hypothesis).split()
+        distance = word_edit_distance(reference_words, hypothesis_words)
+        edits += distance
+        words += len(reference_words)
+        if distance:
+            differing.append((clip.name, reference, hypothesis))
+    print(f"Transcripts differing from fp32: {len(differing)}/{len(clips)} ({len(differing) / len(clips):.0%})")
+    print(f"Word difference rate vs fp32: {edits / max(words, 1):.2%}")
+    for name, reference, hypothesis in differing:
+        print(f"  {name}:\n    fp32: {reference}\n    {args.backend}: {hypothesis}")
+
+if __name__ == "__main__":
+    main()
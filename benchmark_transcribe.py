@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+from communication import Communication
+from pathlib import Path
+import argparse
+import time
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a"}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare batched Whisper transcription against the per-file loop')
+    parser.add_argument('--audio-dir', type=str, default='audio_tests', help='Directory with the clips to transcribe')
+    parser.add_argument('--model', type=str, default='tiny', help='Whisper model name')
+    parser.add_argument('--batch-size', type=int, default=8, help='Clips per batched forward pass')
+    parser.add_argument('--language', type=str, default=None, help='Pin the decoding language (e.g. en)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per mode')
+    args = parser.parse_args()
+
+    clips = sorted(p for p in Path(args.audio_dir).iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS)
+    if not clips:
+        print(f"No audio clips found in {args.audio_dir}")
+        return
+
+    print(f"Loading Whisper model '{args.model}'...")
+    comm = Communication(model_name=args.model)
+    print(f"Benchmarking {len(clips)} clips, {args.repeat} runs per mode")
+
+    # warm-up so one-off allocations are not counted against either mode
+    comm.transcribe_audio(clips[0])
+
+    loop_times, batch_times = [], []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        loop_results = [comm.model.transcribe(str(clip), language=args.language) for clip in clips]
+        loop_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        batch_results = comm.transcribe_batch(clips, language=args.language, batch_size=args.batch_size)
+        batch_times.append(time.perf_counter() - start)
+
+    loop_best, batch_best = min(loop_times), min(batch_times)
+    print(f"Loop:  {loop_best:.2f}s ({len(clips) / loop_best:.2f} clips/s)")
+    print(f"Batch: {batch_best:.2f}s ({len(clips) / batch_best:.2f} clips/s)")
+    print(f"Speedup: {loop_best / batch_best:.2f}x")
+
+    mismatches = [
+        (clip.name, a["text"].strip(), b["text"].strip())
+        for clip, a, b in zip(clips, loop_results, batch_results)
+        if a["text"].strip() != b["text"].strip()
+    ]
+    print(f"Transcripts differing between modes: {len(mismatches)}/{len(clips)}")
+    for name, loop_text, batch_text in mismatches:
+        print(f"  {name}:\n    loop:  {loop_text}\n    batch: {batch_text}")
+
+if __name__ == "__main__":
+    main()
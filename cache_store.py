@@ -0,0 +1,434 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+
+class CacheStore:
+    """
+    Interface for response cache backends: a bounded key -> answer map with
+    LRU and TTL eviction. Each answer can record the source pages it was
+    generated from, so a sync can evict exactly the answers that depend on
+    changed pages. ``put`` and ``invalidate_pages`` return the keys they
+    removed so callers can drop anything derived from them (e.g. semantic
+    index entries).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        """
+        :param max_entries: Maximum number of cached answers.
+        :param max_bytes: Maximum total size of cached questions and answers.
+        :param ttl: Seconds after which an answer expires, or None to keep it until evicted.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def put(self, key: str, answer: str, question: str = "", embedding: Optional[np.ndarray] = None,
+            sources: Optional[Dict[str, str]] = None, corpus_version: Optional[int] = None) -> List[str]:
+        """
+        :param sources: Page ID -> content hash of every page the answer's retrieved nodes came from.
+        :param corpus_version: Version of the indexed corpus the answer was generated against.
+        :return: Keys evicted to make room.
+        """
+        raise NotImplementedError
+
+    def delete(self, keys: List[str]):
+        raise NotImplementedError
+
+    def invalidate_pages(self, page_ids: List[str]) -> List[str]:
+        """
+        Deletes every answer generated from any of ``page_ids`` and returns their keys.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def iter_entries(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields entries most recently used first, without loading the whole cache.
+        """
+        raise NotImplementedError
+
+    def iter_embeddings(self) -> Iterator[tuple]:
+        """
+        Yields ``(key, embedding)`` for every entry stored with an embedding.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+
+class SQLiteCacheStore(CacheStore):
+    """
+    SQLite-backed cache. Every insert is its own transaction (WAL journal), so
+    a crash never leaves a half-written cache and inserts cost O(1) instead of
+    rewriting the whole file.
+    """
+
+    def __init__(self, path: Union[str, Path], **limits):
+        super().__init__(**limits)
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, question TEXT, answer TEXT NOT NULL, embedding BLOB, "
+            "size INTEGER NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(responses)")]
+        if "corpus_version" not in columns:
+            self.conn.execute("ALTER TABLE responses ADD COLUMN corpus_version INTEGER")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answer_sources ("
+            "key TEXT NOT NULL, page_id TEXT NOT NULL, content_hash TEXT, PRIMARY KEY (key, page_id))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answer_sources_page_id ON answer_sources (page_id)")
+        self.last_purge = 0.0
+        self._refresh_totals()
+
+    def _refresh_totals(self):
+        self.count, self.total_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT answer, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1]):
+                self._delete_keys([key])
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key: str, answer: str, question: str = "", embedding: Optional[np.ndarray] = None,
+            sources: Optional[Dict[str, str]] = None, corpus_version: Optional[int] = None) -> List[str]:
+        now = time.time()
+        size = len(answer.encode()) + len(question.encode())
+        blob = None if embedding is None else np.asarray(embedding, dtype=np.float32).tobytes()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, question, answer, embedding, size, created_at, accessed_at, corpus_version) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, question, answer, blob, size, now, now, corpus_version)
+                )
+                self.conn.execute("DELETE FROM answer_sources WHERE key = ?", (key,))
+                self.conn.executemany(
+                    "INSERT INTO answer_sources (key, page_id, content_hash) VALUES (?, ?, ?)",
+                    [(key, page_id, content_hash) for page_id, content_hash in (sources or {}).items()]
+                )
+                self.count += 0 if old else 1
+                self.total_bytes += size - (old[0] if old else 0)
+                evicted = self._evict(now)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                self._refresh_totals()
+                raise
+        return evicted
+
+    def _delete_keys(self, keys: List[str]):
+        for key in keys:
+            row = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.conn.execute("DELETE FROM answer_sources WHERE key = ?", (key,))
+                self.count -= 1
+                self.total_bytes -= row[0]
+
+    def _evict(self, now: float) -> List[str]:
+        evicted = {}
+        # Expired rows are purged at most once a minute; get() catches the rest lazily
+        if self.ttl is not None and now - self.last_purge > 60:
+            rows = self.conn.execute("SELECT key, size FROM responses WHERE created_at < ?", (now - self.ttl,))
+            evicted.update(rows.fetchall())
+            self.last_purge = now
+
+        count = self.count - len(evicted)
+        total_bytes = self.total_bytes - sum(evicted.values())
+        over_entries = self.max_entries is not None and count > self.max_entries
+        over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes
+        if over_entries or over_bytes:
+            # Walk the LRU end of the accessed_at index until both caps hold again
+            for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                if not ((self.max_entries is not None and count > self.max_entries)
+                        or (self.max_bytes is not None and total_bytes > self.max_bytes)):
+                    break
+                if key in evicted:
+                    continue
+                evicted[key] = size
+                count -= 1
+                total_bytes -= size
+
+        self._delete_keys(list(evicted))
+        return list(evicted)
+
+    def delete(self, keys: List[str]):
+        with self.lock:
+            self._delete_keys(keys)
+
+    def invalidate_pages(self, page_ids: List[str]) -> List[str]:
+        if not page_ids:
+            return []
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                placeholders = ", ".join("?" * len(page_ids))
+                keys = [row[0] for row in self.conn.execute(
+                    f"SELECT DISTINCT key FROM answer_sources WHERE page_id IN ({placeholders})", list(page_ids)
+                )]
+                self._delete_keys(keys)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                self._refresh_totals()
+                raise
+        return keys
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.execute("DELETE FROM answer_sources")
+            self.conn.execute("VACUUM")
+            self._refresh_totals()
+
+    def iter_entries(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        with self.lock:
+            cursor = self.conn.execute(
+                "SELECT key, question, answer, created_at, accessed_at FROM responses "
+                "ORDER BY accessed_at DESC LIMIT ?", (-1 if limit is None else limit,)
+            )
+            rows = cursor.fetchmany(100)
+        while rows:
+            for key, question, answer, created_at, accessed_at in rows:
+                yield {"key": key, "question": question, "answer": answer,
+                       "created_at": created_at, "accessed_at": accessed_at}
+            with self.lock:
+                rows = cursor.fetchmany(100)
+
+    def iter_embeddings(self) -> Iterator[tuple]:
+        with self.lock:
+            rows = self.conn.execute("SELECT key, embedding FROM responses WHERE embedding IS NOT NULL").fetchall()
+        for key, blob in rows:
+            yield key, np.frombuffer(blob, dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            self._refresh_totals()
+            count, total = self.count, self.total_bytes
+            oldest = self.conn.execute("SELECT MIN(created_at) FROM responses").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "entries": count,
+            "bytes": total,
+            "file_bytes": self.path.stat().st_size if self.path.exists() else 0,
+            "oldest_entry": oldest,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class JSONCacheStore(CacheStore):
+    """
+    The original single-file JSON cache. Every insert rewrites the whole file,
+    so it is only meant for small caches; writes go through a temporary file
+    and an atomic rename.
+    """
+
+    def __init__(self, path: Union[str, Path], **limits):
+        super().__init__(**limits)
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                now = time.time()
+                for key, value in data.items():
+                    # Plain strings are entries written before the cache tracked metadata
+                    if isinstance(value, str):
+                        value = {"question": "", "answer": value, "created_at": now}
+                    self.entries[key] = value
+            except Exception as e:
+                logging.error(f"Error loading cache file {self.path}: {e}")
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _save(self):
+        tmp_file = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_file, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_file, self.path)
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry["created_at"]):
+                del self.entries[key]
+                self._save()
+                return None
+            self.entries.move_to_end(key)
+            return entry["answer"]
+
+    def put(self, key: str, answer: str, question: str = "", embedding: Optional[np.ndarray] = None,
+            sources: Optional[Dict[str, str]] = None, corpus_version: Optional[int] = None) -> List[str]:
+        entry = {"question": question, "answer": answer, "created_at": time.time(),
+                 "sources": sources or {}, "corpus_version": corpus_version}
+        if embedding is not None:
+            entry["embedding"] = np.asarray(embedding, dtype=np.float32).tolist()
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            evicted = [k for k, e in self.entries.items() if self._expired(e["created_at"])]
+            for k in evicted:
+                del self.entries[k]
+            total = sum(len(e["answer"].encode()) + len(e["question"].encode()) for e in self.entries.values())
+            while self.entries and (
+                (self.max_entries is not None and len(self.entries) > self.max_entries)
+                or (self.max_bytes is not None and total > self.max_bytes)
+            ):
+                k, e = self.entries.popitem(last=False)
+                total -= len(e["answer"].encode()) + len(e["question"].encode())
+                evicted.append(k)
+            self._save()
+        return evicted
+
+    def delete(self, keys: List[str]):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+            self._save()
+
+    def invalidate_pages(self, page_ids: List[str]) -> List[str]:
+        page_ids = set(page_ids)
+        with self.lock:
+            keys = [k for k, e in self.entries.items() if page_ids & set(e.get("sources", {}))]
+            for key in keys:
+                del self.entries[key]
+            if keys:
+                self._save()
+        return keys
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self._save()
+
+    def iter_entries(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        with self.lock:
+            keys = list(reversed(self.entries))[:limit]
+        for key in keys:
+            entry = self.entries.get(key)
+            if entry is not None:
+                yield {"key": key, "question": entry["question"], "answer": entry["answer"],
+                       "created_at": entry["created_at"], "accessed_at": None}
+
+    def iter_embeddings(self) -> Iterator[tuple]:
+        with self.lock:
+            items = [(k, e["embedding"]) for k, e in self.entries.items() if "embedding" in e]
+        for key, embedding in items:
+            yield key, np.asarray(embedding, dtype=np.float32)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = sum(len(e["answer"].encode()) + len(e["question"].encode()) for e in self.entries.values())
+            oldest = min((e["created_at"] for e in self.entries.values()), default=None)
+            count = len(self.entries)
+        return {
+            "backend": "json",
+            "entries": count,
+            "bytes": total,
+            "file_bytes": self.path.stat().st_size if self.path.exists() else 0,
+            "oldest_entry": oldest,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+        }
+
+
+CACHE_BACKENDS = {
+    "sqlite": (SQLiteCacheStore, "response_cache.db"),
+    "json": (JSONCacheStore, "response_cache.json"),
+}
+
+
+def find_legacy_cache(cache_dir: Union[str, Path]) -> Optional[Path]:
+    """
+    The pre-normalization ``response_cache.json`` in ``cache_dir``, if one is
+    left. Its answers are keyed by a hash of the raw question, which lookups
+    no longer produce, so the SQLite backend never reads it. Files written by
+    the JSON backend (metadata entries rather than plain strings) are not legacy.
+    """
+    legacy_file = Path(cache_dir) / "response_cache.json"
+    if not legacy_file.exists():
+        return None
+    try:
+        with open(legacy_file, 'r') as f:
+            legacy_cache = json.load(f)
+    except Exception as e:
+        logging.error(f"Error reading cache file {legacy_file}: {e}")
+        return None
+    if isinstance(legacy_cache, dict) and all(isinstance(answer, str) for answer in legacy_cache.values()):
+        return legacy_file
+    return None
+
+
+def open_cache_store(backend: str, cache_dir: Union[str, Path], **limits) -> CacheStore:
+    """
+    Opens the response cache for ``backend`` inside ``cache_dir``. Opening
+    never modifies a legacy JSON cache; ``manage_cache.py --action clear``
+    removes it.
+    """
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown cache backend: {backend}. Choose from {list(CACHE_BACKENDS)}")
+    cache_dir = Path(cache_dir)
+    store_class, file_name = CACHE_BACKENDS[backend]
+    store = store_class(cache_dir / file_name, **limits)
+
+    if backend == "sqlite":
+        legacy_file = find_legacy_cache(cache_dir)
+        if legacy_file is not None:
+            logging.info(f"Legacy response cache {legacy_file} is not used; "
+                         f"`manage_cache.py --action clear --type response` removes it.")
+    return store
@@ -0,0 +1,282 @@
+import re
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from util import lazy_import, split_sentences
+
+llama_utils = lazy_import("llama_index.core.utils")
+
+# Document metadata key holding one structure code per line of the page text
+LINE_TYPES_KEY = "line_types"
+
+# Notion block type -> structure code; everything else is a plain line ("p")
+BLOCK_LINE_TYPES = {
+    "heading_1": "h1",
+    "heading_2": "h2",
+    "heading_3": "h3",
+    "bulleted_list_item": "li",
+    "numbered_list_item": "li",
+    "to_do": "li",
+    "toggle": "li",
+    "table_row": "tr",
+}
+HEADING_LEVELS = {"h1": 1, "h2": 2, "h3": 3}
+
+# words worth matching between a question and a context sentence
+WORD = re.compile(r"[a-z0-9]{3,}")
+
+
+def default_tokenizer() -> Callable[[str], Sequence]:
+    # the tokenizer llama-index itself uses to size prompts
+    return llama_utils.get_tokenizer()
+
+
+class _Unit:
+    """A line plus its indented children, or a whole table; never split unless it alone exceeds the budget."""
+
+    def __init__(self, kind: str, depth: int, lines: List[str]):
+        self.kind = kind
+        self.depth = depth
+        self.lines = lines
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+class StructureChunker:
+    """
+    Splits Notion page text into token-budgeted chunks along the page's
+    structure. Every heading starts a new section and chunks never span two
+    sections; each chunk starts with its heading path (``Heading > Subheading``), so
+    a retrieved chunk still says where it came from. Within a section, list
+    items stay with their nested children and tables with their rows. A
+    unit that alone exceeds the budget is split by rows (repeating a table's
+    header row), then lines, then words.
+
+    Without structure codes (documents cached before the reader recorded
+    them), only indentation is used and the page is one section.
+    """
+
+    def __init__(self, chunk_size: int = 512, chunk_overlap: int = 64,
+                 tokenizer: Optional[Callable[[str], Sequence]] = None):
+        """
+        :param chunk_size: Maximum tokens per chunk, heading path included.
+        :param chunk_overlap: Tokens of trailing units repeated at the start of the next chunk in the same section.
+        :param tokenizer: Text -> tokens; defaults to llama-index's tokenizer.
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._tokenizer = tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        if self._tokenizer is None:
+            self._tokenizer = default_tokenizer()
+        return len(self._tokenizer(text))
+
+    def _sections(self, lines: List[str], line_types: List[str]) -> List[Tuple[str, List[Tuple[str, str]]]]:
+        sections = []
+        headings: List[Tuple[int, str]] = []
+        current: List[Tuple[str, str]] = []
+        for line, kind in zip(lines, line_types):
+            if not line.strip():
+                continue
+            if kind in HEADING_LEVELS:
+                if current:
+                    sections.append((" > ".join(title for _, title in headings), current))
+                    current = []
+                level = HEADING_LEVELS[kind]
+                headings = [h for h in headings if h[0] < level] + [(level, line.strip())]
+            else:
+                current.append((line, kind))
+        if current:
+            sections.append((" > ".join(title for _, title in headings), current))
+        return sections
+
+    def _units(self, lines: List[Tuple[str, str]]) -> List[_Unit]:
+        units: List[_Unit] = []
+        for line, kind in lines:
+            depth = len(line) - len(line.lstrip("\t"))
+            last = units[-1] if units else None
+            if kind == "tr":
+                if last is not None and last.kind == "table" and depth == last.depth:
+                    last.lines.append(line)
+                else:
+                    units.append(_Unit("table", depth, [line]))
+            elif last is not None and last.kind != "table" and depth > last.depth:
+                last.lines.append(line)
+            else:
+                units.append(_Unit(kind, depth, [line]))
+        return units
+
+    def _fit(self, unit: _Unit, budget: int) -> List[_Unit]:
+        if self.count_tokens(unit.text) <= budget:
+            return [unit]
+        if len(unit.lines) == 1:
+            # one overlong line: cut it into word runs
+            pieces, current = [], []
+            for word in unit.lines[0].split(" "):
+                if current and self.count_tokens(" ".join(current + [word])) > budget:
+                    pieces.append(_Unit(unit.kind, unit.depth, [" ".join(current)]))
+                    current = []
+                current.append(word)
+            if current:
+                pieces.append(_Unit(unit.kind, unit.depth, [" ".join(current)]))
+            return pieces
+
+        # tables repeat their header row in every piece so columns stay labelled
+        header = [unit.lines[0]] if unit.kind == "table" else []
+        rows = unit.lines[1:] if header else unit.lines
+        pieces, current = [], list(header)
+        for row in rows:
+            if len(current) > len(header) and self.count_tokens("\n".join(current + [row])) > budget:
+                pieces.append(_Unit(unit.kind, unit.depth, current))
+                current = list(header)
+            current.append(row)
+        pieces.append(_Unit(unit.kind, unit.depth, current))
+        # a single row can still be too long on its own
+        return [fitted for piece in pieces for fitted in (
+            [piece] if len(piece.lines) > 1 else self._fit(piece, budget)
+        )]
+
+    def split(self, text: str, line_types: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """
+        :param text: Page text in the reader's layout (one line per rich text, a tab per nesting level).
+        :param line_types: Structure code per line, as recorded by the reader.
+        :return: ``(chunk_text, section_path)`` pairs in page order.
+        """
+        lines = text.split("\n")
+        if line_types is None or len(line_types) != len(lines):
+            line_types = ["p"] * len(lines)
+
+        chunks = []
+        for path, section_lines in self._sections(lines, line_types):
+            prefix = f"{path}\n" if path else ""
+            budget = max(1, self.chunk_size - self.count_tokens(prefix))
+            units = [piece for unit in self._units(section_lines) for piece in self._fit(unit, budget)]
+
+            current: List[_Unit] = []
+            current_tokens = 0
+            for unit in units:
+                tokens = self.count_tokens(unit.text)
+                if current and current_tokens + tokens > budget:
+                    chunks.append((prefix + "\n".join(u.text for u in current), path))
+                    # carry trailing units into the next chunk, up to chunk_overlap tokens
+                    overlap, overlap_tokens = [], 0
+                    for previous in reversed(current):
+                        previous_tokens = self.count_tokens(previous.text)
+                        if overlap_tokens + previous_tokens > self.chunk_overlap:
+                            break
+                        overlap.insert(0, previous)
+                        overlap_tokens += previous_tokens
+                    if overlap_tokens + tokens > budget:
+                        overlap, overlap_tokens = [], 0
+                    current, current_tokens = overlap, overlap_tokens
+                current.append(unit)
+                current_tokens += tokens
+            if current:
+                chunks.append((prefix + "\n".join(u.text for u in current), path))
+        return chunks
+
+
+def fit_to_budget(texts: List[str], max_tokens: int, query: str, count_tokens: Callable[[str], int],
+                  min_tokens: int = 32) -> List[Optional[str]]:
+    """
+    Trims retrieved contexts, best first, to ``max_tokens`` in total. Contexts
+    that fit are kept whole. The first one that does not fit keeps only its
+    sentences that share the most words with ``query``, in their original
+    order. Once less than ``min_tokens`` remain, the rest are dropped (None).
+    """
+    query_words = set(WORD.findall(query.lower()))
+    remaining = max_tokens
+    fitted: List[Optional[str]] = []
+    for text in texts:
+        tokens = count_tokens(text)
+        if tokens <= remaining:
+            fitted.append(text)
+            remaining -= tokens
+            continue
+        if remaining < min_tokens:
+            fitted.append(None)
+            continue
+
+        sentences = [s for line in text.split("\n") for s in split_sentences(line)]
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: len(query_words & set(WORD.findall(sentences[i].lower()))),
+            reverse=True
+        )
+        keep = set()
+        for i in ranked:
+            sentence_tokens = count_tokens(sentences[i])
+            if sentence_tokens <= remaining:
+                keep.add(i)
+                remaining -= sentence_tokens
+        fitted.append("\n".join(sentences[i] for i in sorted(keep)) if keep else None)
+    return fitted
+
+
+def structure_node_parser(chunker: StructureChunker):
+    """
+    Wraps a StructureChunker as a llama-index node parser, for use as the
+    index's transformation on both full builds and incremental inserts.
+    """
+    from llama_index.core.bridge.pydantic import PrivateAttr
+    from llama_index.core.node_parser import NodeParser
+    from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+
+    class NotionStructureNodeParser(NodeParser):
+        _chunker: Any = PrivateAttr()
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._chunker = chunker
+
+        def _parse_nodes(self, nodes, show_progress=False, **kwargs):
+            parsed = []
+            for node in nodes:
+                line_types = node.metadata.get(LINE_TYPES_KEY)
+                chunks = self._chunker.split(node.get_content(), line_types.split(",") if line_types else None)
+                built = build_nodes_from_splits([text for text, _ in chunks], node, id_func=self.id_func)
+                # metadata is copied here rather than by NodeParser so the per-line codes stay out of the vector store
+                metadata = {k: v for k, v in node.metadata.items() if k != LINE_TYPES_KEY}
+                for chunk_node, (_, section) in zip(built, chunks):
+                    chunk_node.metadata = dict(metadata, section=section) if section else dict(metadata)
+                parsed.extend(built)
+            return parsed
+
+    return NotionStructureNodeParser(include_metadata=False, include_prev_next_rel=True)
+
+
+def token_budget_postprocessor(max_tokens: int, count_tokens: Callable[[str], int]):
+    """
+    llama-index node postprocessor that applies fit_to_budget to the
+    retrieved nodes before they fill the prompt template.
+    """
+    from llama_index.core.bridge.pydantic import PrivateAttr
+    from llama_index.core.postprocessor.types import BaseNodePostprocessor
+
+    class TokenBudgetPostprocessor(BaseNodePostprocessor):
+        _max_tokens: int = PrivateAttr()
+        _count_tokens: Any = PrivateAttr()
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._max_tokens = max_tokens
+            self._count_tokens = count_tokens
+
+        def _postprocess_nodes(self, nodes, query_bundle=None):
+            nodes = sorted(nodes, key=lambda n: n.score or 0.0, reverse=True)
+            query = query_bundle.query_str if query_bundle is not None else ""
+            fitted = fit_to_budget([n.node.get_content() for n in nodes], self._max_tokens, query, self._count_tokens)
+            kept = []
+            for node, text in zip(nodes, fitted):
+                if text is None:
+                    continue
+                # nodes are built fresh for every retrieval, so trimming them in place is safe
+                node.node.set_content(text)
+                kept.append(node)
+            return kept
+
+    return TokenBudgetPostprocessor()
@@ -1,48 +1,258 @@
+import io
 import os
-import whisper
+import subprocess
+import wave
 import tempfile
+import threading
 from pathlib import Path
-import torch
-import torchaudio
 import numpy as np
 import shutil
-import ssl
 import time
-from typing import Optional, Dict, Any, Union
-from gtts import gTTS
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Dict, Any, Union, List
+from asr_backends import configure_torch_threads, create_asr_backend
+from audio_cache import AudioCache, audio_cache_key
+from tts_backends import create_tts_backend, synthesize_segment
+from util import lazy_import, split_sentences
+from vad import EnergyVAD
+
+# torch and whisper dominate import time; they load when the first Communication is created
+torch = lazy_import("torch")
+torchaudio = lazy_import("torchaudio")
+whisper = lazy_import("whisper")
+
+# raw audio accepted by the in-memory transcription path
+AudioInput = Union[bytes, bytearray, memoryview, np.ndarray]
 
 class Communication:
     # initializes the audio processing system with model and device configuration
-    def __init__(self, model_name: str = "tiny", device: Optional[str] = None):
-        if device is None:
+    def __init__(self, model_name: str = "tiny", device: Optional[str] = None,
+                 tts_backend: str = "gtts", tts_workers: int = 4,
+                 audio_cache_dir: Optional[Union[str, Path]] = "audio_cache", vad: bool = True,
+                 asr_backend: str = "whisper", asr_threads: Optional[int] = None, language: Optional[str] = None,
+                 vad_threshold_db: float = -60.0):
+        self.asr = create_asr_backend(asr_backend)
+        if self.asr.cpu_only:
+            device = "cpu"
+        elif device is None:
             device = "cuda" if torch.cuda.is_available() else "cpu"
         
         self.device = device
-        self.model = whisper.load_model(model_name).to(device)
+        configure_torch_threads(asr_threads)
+        self.model = self.asr.load(model_name, device)
+        # a pinned language skips whisper's language detection pass
+        self.language = language
         self.temp_dir = tempfile.mkdtemp()
+        # frames below vad_threshold_db (dBFS) are always silence; above it, speech is judged against the clip's noise floor
+        self.vad = EnergyVAD(sample_rate=whisper.audio.SAMPLE_RATE, threshold_db=vad_threshold_db) if vad else None
+        self.vad_totals = {"requests": 0, "rejected": 0, "audio_seconds": 0.0, "seconds_saved": 0.0}
+        self.vad_lock = threading.Lock()
         self.tts_enabled = True
-        self.max_retries = 3
+        self.tts = create_tts_backend(tts_backend)
+        self.tts_workers = tts_workers
+        self._tts_process_pool = None
+        self.max_retries = 3  # only remote tts backends are retried
         self.retry_delay = 2  # seconds
+        self.audio_cache_max_bytes = 500 * 1024 * 1024  # 500 MB
+        self.audio_cache = AudioCache(audio_cache_dir, self.audio_cache_max_bytes) if audio_cache_dir else None
         
+    # running vad totals, copied under the lock
+    def get_vad_totals(self) -> Dict[str, Any]:
+        with self.vad_lock:
+            return dict(self.vad_totals)
+    
     # converts audio file to text using whisper model
     def transcribe_audio(self, audio_path: Union[str, Path]) -> Dict[str, Any]:
         if not os.path.exists(audio_path):
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        
+        if self.vad is None:
+            return self._whisper_transcribe(str(audio_path))
+        return self.transcribe_audio_array(whisper.load_audio(str(audio_path)))
+    
+    # whisper's own transcribe loop, with the pinned language and fp16 only where it is supported
+    def _whisper_transcribe(self, audio: Union[str, np.ndarray]) -> Dict[str, Any]:
+        return self.model.transcribe(audio, language=self.language, fp16=self.device == "cuda")
+    
+    # transcribes several clips with batched forward passes; clips longer than whisper's 30 s window fall back to transcribe
+    def transcribe_batch(self, audio_paths: List[Union[str, Path]], language: Optional[str] = None,
+                         batch_size: int = 8) -> List[Dict[str, Any]]:
+        for audio_path in audio_paths:
+            if not os.path.exists(audio_path):
+                raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        
+        audios = [whisper.load_audio(str(audio_path)) for audio_path in audio_paths]
+        return self._transcribe_arrays(audios, language, batch_size)
+    
+    # batched transcription of decoded 16 khz clips, shared by transcribe_batch and the vad segment path
+    def _transcribe_arrays(self, audios: List[np.ndarray], language: Optional[str] = None,
+                           batch_size: int = 8) -> List[Dict[str, Any]]:
+        language = language or self.language
+        results: List[Optional[Dict[str, Any]]] = [None] * len(audios)
+        short_clips = []
+        for i, audio in enumerate(audios):
+            if len(audio) > whisper.audio.N_SAMPLES:
+                results[i] = self.model.transcribe(audio, language=language, fp16=self.device == "cuda")
+            else:
+                short_clips.append((i, audio))
+        
+        n_mels = getattr(self.model.dims, "n_mels", 80)
+        for start in range(0, len(short_clips), batch_size):
+            batch = short_clips[start:start + batch_size]
+            mel = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=n_mels) for _, audio in batch
+            ]).to(self.device)
             
-        result = self.model.transcribe(str(audio_path))
-        return result
-    
-    # handles audio transcription from raw bytes data
-    def transcribe_audio_bytes(self, audio_bytes: bytes) -> Dict[str, Any]:
-        temp_file = os.path.join(self.temp_dir, "temp_audio.mp3")
-        with open(temp_file, "wb") as f:
-            f.write(audio_bytes)
+            if language is None:
+                _, probs = self.model.detect_language(mel)
+                languages = [max(p, key=p.get) for p in probs]
+            else:
+                languages = [language] * len(batch)
             
-        result = self.transcribe_audio(temp_file)
+            # decoding options take a single language, so decode each language group as its own batch
+            for lang in set(languages):
+                rows = [j for j, l in enumerate(languages) if l == lang]
+                options = whisper.DecodingOptions(language=lang, without_timestamps=True, fp16=self.device == "cuda")
+                decoded = whisper.decode(self.model, mel[rows], options)
+                for j, result in zip(rows, decoded):
+                    i, audio = batch[j]
+                    results[i] = {
+                        "text": result.text,
+                        "language": result.language,
+                        "segments": [{
+                            "id": 0,
+                            "start": 0.0,
+                            "end": len(audio) / whisper.audio.SAMPLE_RATE,
+                            "text": result.text,
+                            "tokens": result.tokens,
+                            "temperature": result.temperature,
+                            "avg_logprob": result.avg_logprob,
+                            "compression_ratio": result.compression_ratio,
+                            "no_speech_prob": result.no_speech_prob,
+                        }],
+                    }
         
-        os.remove(temp_file)
+        return results
+    
+    # decodes a 16-bit pcm wav payload directly, resampling to whisper's rate; returns None for anything else
+    def _decode_wav(self, data: bytes) -> Optional[np.ndarray]:
+        if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+            return None
+        try:
+            with wave.open(io.BytesIO(data)) as wav:
+                if wav.getsampwidth() != 2:
+                    return None
+                channels, rate = wav.getnchannels(), wav.getframerate()
+                frames = wav.readframes(wav.getnframes())
+        except wave.Error:
+            return None
+        
+        audio = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+        if channels > 1:
+            audio = audio.reshape(-1, channels).mean(axis=1)
+        if rate != whisper.audio.SAMPLE_RATE:
+            audio = torchaudio.functional.resample(torch.from_numpy(audio), rate, whisper.audio.SAMPLE_RATE).numpy()
+        return audio
+    
+    # runs ffmpeg on `source` (a file path, or pipe:0 fed with `data`) and returns float32 mono pcm at 16 khz
+    def _ffmpeg_decode(self, source: str, data: Optional[bytes] = None) -> np.ndarray:
+        cmd = [
+            "ffmpeg", "-nostdin", "-threads", "0", "-i", source,
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(whisper.audio.SAMPLE_RATE), "pipe:1"
+        ]
+        try:
+            out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')}") from e
+        return np.frombuffer(out, dtype=np.int16).astype(np.float32) / 32768.0
+    
+    # decodes any encoded audio payload in memory: wav directly, everything else piped through ffmpeg stdin/stdout
+    def decode_audio_bytes(self, audio_bytes: Union[bytes, bytearray, memoryview]) -> np.ndarray:
+        data = bytes(audio_bytes)
+        audio = self._decode_wav(data)
+        if audio is not None:
+            return audio
         
-        return result
+        # mp4/m4a (an "ftyp" box at offset 4) often keep their index after the audio, which ffmpeg can only reach by seeking
+        if data[4:8] != b"ftyp":
+            try:
+                audio = self._ffmpeg_decode("pipe:0", data)
+                if len(audio):
+                    return audio
+            except RuntimeError:
+                pass
+        
+        # seekable fallback: a temporary file for mp4-family input and anything the pipe could not decode
+        fd, path = tempfile.mkstemp(prefix="rocky_audio_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            return self._ffmpeg_decode(path)
+        finally:
+            os.unlink(path)
+    
+    # converts in-memory audio to whisper's input: float32 mono pcm at 16 khz
+    def load_audio_input(self, audio: AudioInput) -> np.ndarray:
+        if isinstance(audio, memoryview) and audio.format in ("f", "d", "h"):
+            # typed buffers already hold pcm samples rather than an encoded file
+            audio = np.asarray(audio)
+        if isinstance(audio, np.ndarray):
+            if audio.dtype == np.int16:
+                audio = audio.astype(np.float32) / 32768.0
+            if audio.ndim == 2:
+                # multi-channel pcm is downmixed; channels are the shorter axis, (samples, channels) or (channels, samples)
+                audio = audio.mean(axis=0 if audio.shape[0] < audio.shape[1] else 1)
+            return np.ascontiguousarray(audio, dtype=np.float32)
+        return self.decode_audio_bytes(audio)
+    
+    # transcribes in-memory audio without touching the filesystem; with vad, only the detected speech is decoded
+    def transcribe_audio_array(self, audio: np.ndarray) -> Dict[str, Any]:
+        if self.vad is None:
+            return self._whisper_transcribe(audio)
+        
+        speech = self.vad.split(audio)
+        report = self.vad.report(audio, speech)
+        # the server and async callers transcribe concurrently
+        with self.vad_lock:
+            self.vad_totals["requests"] += 1
+            self.vad_totals["audio_seconds"] += report["audio_seconds"]
+            self.vad_totals["seconds_saved"] += report["seconds_saved"]
+            if not speech:
+                self.vad_totals["rejected"] += 1
+        if not speech:
+            # empty recordings never reach whisper, which tends to hallucinate text on silence
+            print(f"VAD: no speech in {report['audio_seconds']:.1f}s clip, skipping transcription")
+            return {"text": "", "segments": [], "language": None, "vad": report}
+        print(f"VAD: kept {report['speech_seconds']:.1f}s of {report['audio_seconds']:.1f}s "
+              f"in {len(speech)} segment(s), saved {report['seconds_saved']:.1f}s")
+        
+        pieces = [audio[start:end] for start, end in speech]
+        if len(pieces) == 1:
+            results = [self._whisper_transcribe(pieces[0])]
+        else:
+            # independent speech segments share batched forward passes
+            results = self._transcribe_arrays(pieces)
+        
+        merged_segments = []
+        for (start, _), result in zip(speech, results):
+            offset = start / whisper.audio.SAMPLE_RATE
+            for segment in result["segments"]:
+                merged_segments.append({
+                    **segment,
+                    "id": len(merged_segments),
+                    "start": segment["start"] + offset,
+                    "end": segment["end"] + offset,
+                })
+        return {
+            "text": " ".join(result["text"].strip() for result in results if result["text"].strip()),
+            "segments": merged_segments,
+            "language": results[0]["language"],
+            "vad": report,
+        }
+    
+    # handles audio transcription from raw bytes data, numpy pcm arrays or memoryview buffers
+    def transcribe_audio_bytes(self, audio_bytes: AudioInput) -> Dict[str, Any]:
+        return self.transcribe_audio_array(self.load_audio_input(audio_bytes))
     
     # extracts text content from audio file transcription
     def get_text_from_audio(self, audio_path: Union[str, Path]) -> str:
@@ -50,40 +260,90 @@ class Communication:
         return result["text"]
     
     # extracts text content from audio bytes transcription
-    def get_text_from_audio_bytes(self, audio_bytes: bytes) -> str:
+    def get_text_from_audio_bytes(self, audio_bytes: AudioInput) -> str:
         result = self.transcribe_audio_bytes(audio_bytes)
         return result["text"]
     
-    # converts text to speech and saves to specified output path
+    # converts text to speech and saves to specified output path; multi-sentence text is synthesized sentence by sentence in parallel
     def text_to_speech(self, text: str, output_path: Union[str, Path], 
-                      lang: str = "en", speed: float = 1.0) -> None:
+                      lang: str = "en", speed: float = 1.0) -> bool:
         os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
         
-        # Try with retries
-        for attempt in range(self.max_retries):
+        sentences = split_sentences(text) if self.tts.parallel else []
+        if len(sentences) <= 1:
+            sentences = [text]
+        
+        work_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        segment_paths = [
+            os.path.join(work_dir, f"segment_{i:03d}.{self.tts.file_format}") for i in range(len(sentences))
+        ]
+        try:
+            if len(sentences) == 1:
+                self._synthesize_with_retries(sentences[0], segment_paths[0], lang, speed)
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.tts_workers, len(sentences))) as pool:
+                    # list() re-raises the first failed segment
+                    list(pool.map(
+                        lambda job: self._synthesize_with_retries(job[0], job[1], lang, speed),
+                        zip(sentences, segment_paths)
+                    ))
+            self._concatenate_audio(segment_paths, output_path)
+            return True
+        except Exception as e:
+            print(f"Error generating speech with {self.tts.name}: {e}")
+            # If synthesis failed, create a simple fallback audio file
+            self._create_fallback_audio(output_path)
+            print(f"Created fallback audio file at {output_path}")
+            return False
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    # runs one synthesis job, in a worker process for engines that are not thread-safe, retrying remote engines
+    def _synthesize_with_retries(self, text: str, output_path: str, lang: str, speed: float) -> None:
+        attempts = self.max_retries if self.tts.remote else 1
+        for attempt in range(attempts):
             try:
-                # Create a custom SSL context that's more permissive
-                ssl_context = ssl.create_default_context()
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.CERT_NONE
-                
-                tts = gTTS(text=text, lang=lang)
-                tts.save(str(output_path))
-                return  # Success, exit the function
-                
-            except Exception as e:
-                print(f"Error generating speech (attempt {attempt+1}/{self.max_retries}): {e}")
-                if attempt < self.max_retries - 1:
-                    print(f"Retrying in {self.retry_delay} seconds...")
-                    time.sleep(self.retry_delay)
+                if self.tts.parallel == "process":
+                    if self._tts_process_pool is None:
+                        self._tts_process_pool = ProcessPoolExecutor(max_workers=self.tts_workers)
+                    self._tts_process_pool.submit(synthesize_segment, self.tts, text, output_path, lang, speed).result()
                 else:
-                    # If all retries failed, create a simple fallback audio file
-                    self._create_fallback_audio(output_path)
-                    print(f"Created fallback audio file at {output_path}")
+                    synthesize_segment(self.tts, text, output_path, lang, speed)
+                return
+            except Exception as e:
+                if attempt == attempts - 1:
+                    raise
+                print(f"Error generating speech (attempt {attempt+1}/{attempts}): {e}")
+                print(f"Retrying in {self.retry_delay} seconds...")
+                time.sleep(self.retry_delay)
+    
+    # joins segments in order into output_path, converting the container when it differs from the engine's
+    def _concatenate_audio(self, segment_paths: List[str], output_path: Union[str, Path]) -> None:
+        output_format = Path(output_path).suffix.lstrip(".").lower() or self.tts.file_format
+        
+        if output_format == self.tts.file_format == "mp3":
+            # mp3 is frame based, so byte concatenation plays back in order
+            with open(output_path, 'wb') as dst:
+                for segment_path in segment_paths:
+                    with open(segment_path, 'rb') as src:
+                        shutil.copyfileobj(src, dst)
+        elif output_format == self.tts.file_format == "wav":
+            with wave.open(segment_paths[0]) as first:
+                params = first.getparams()
+            with wave.open(str(output_path), 'wb') as dst:
+                dst.setparams(params)
+                for segment_path in segment_paths:
+                    with wave.open(segment_path) as src:
+                        dst.writeframes(src.readframes(src.getnframes()))
+        else:
+            waveforms = [torchaudio.load(segment_path) for segment_path in segment_paths]
+            sample_rate = waveforms[0][1]
+            audio = torch.cat([waveform for waveform, _ in waveforms], dim=1)
+            torchaudio.save(str(output_path), audio, sample_rate, format=output_format)
     
     def _create_fallback_audio(self, output_path: Union[str, Path]) -> None:
         """
-        Create a simple fallback audio file when gTTS fails.
+        Create a simple fallback audio file when speech synthesis fails.
         This creates a silent audio file as a placeholder.
         """
         try:
@@ -108,21 +368,43 @@ class Communication:
             with open(output_path, 'wb') as f:
                 f.write(b'')
     
+    # appends an mp3 segment to a growing response file; mp3 is frame based so byte concatenation plays back in order
+    def append_audio(self, segment_path: Union[str, Path], output_path: Union[str, Path]) -> None:
+        with open(segment_path, 'rb') as src, open(output_path, 'ab') as dst:
+            shutil.copyfileobj(src, dst)
+    
     # processes audio file and returns transcribed text
     def process_audio_input(self, audio_path: Union[str, Path]) -> str:
         return self.get_text_from_audio(audio_path)
     
     # processes audio bytes and returns transcribed text
-    def process_audio_input_bytes(self, audio_bytes: bytes) -> str:
+    def process_audio_input_bytes(self, audio_bytes: AudioInput) -> str:
         return self.get_text_from_audio_bytes(audio_bytes)
     
-    # generates audio response from text input
-    def generate_audio_response(self, text: str, output_path: Union[str, Path]) -> None:
-        self.text_to_speech(text, output_path)
+    # generates audio response from text input, reusing audio already synthesized for the same text and voice
+    def generate_audio_response(self, text: str, output_path: Union[str, Path],
+                                lang: str = "en", speed: float = 1.0) -> None:
+        if self.audio_cache is None:
+            self.text_to_speech(text, output_path, lang, speed)
+            return
+        
+        file_format = Path(output_path).suffix.lstrip(".") or self.tts.file_format
+        key = audio_cache_key(text, self.tts.name, lang, speed, file_format)
+        if self.audio_cache.fetch(key, output_path):
+            return
+        
+        # output_path may be a hard link to a cached clip from an earlier response
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+        if self.text_to_speech(text, output_path, lang, speed):
+            # the fallback tone is never cached
+            self.audio_cache.store(key, output_path)
     
-    # cleans up temporary files on object destruction
+    # cleans up temporary files and tts worker processes on object destruction
     def __del__(self):
         try:
+            if getattr(self, '_tts_process_pool', None) is not None:
+                self._tts_process_pool.shutdown(wait=False)
             if hasattr(self, 'temp_dir') and self.temp_dir is not None and os.path.exists(self.temp_dir):
                 shutil.rmtree(self.temp_dir)
         except Exception as e:
@@ -0,0 +1,270 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from util import split_sentences
+
+Message = Dict[str, str]
+
+SUMMARY_PROMPT = """Summarize the conversation below between a user and Rocky, a company assistant, in at most {max_words} words.
+Keep names, numbers, and what the user is asking about; drop greetings and filler.
+
+Summary so far:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+CONDENSE_PROMPT = """Given the conversation below and a follow-up question, rewrite the follow-up as a single standalone question
+that can be understood without the conversation. Keep the user's wording where possible. Reply with the question only.
+
+Conversation:
+{conversation}
+
+Follow-up question: {question}
+Standalone question:"""
+
+# pronouns and openers that point back at earlier turns; everyday words like "this" or "more" are left out
+FOLLOWUP_MARKERS = re.compile(
+    r"\b(it|its|they|them|their|he|him|his|she|her|the same|that one|instead|previous|earlier)\b"
+    r"|^\s*(and|but|or|what about|how about|what else|how come)\b",
+    re.IGNORECASE,
+)
+
+
+def looks_like_followup(question: str) -> bool:
+    """
+    Cheap test for questions that lean on earlier turns; standalone questions
+    skip the condensing LLM call entirely.
+    """
+    return bool(FOLLOWUP_MARKERS.search(question))
+
+
+def render_messages(messages: List[Message]) -> str:
+    return "\n".join(f"{'User' if m['role'] == 'user' else 'Rocky'}: {m['content']}" for m in messages)
+
+
+def extractive_summary(summary: str, messages: List[Message], max_words: int) -> str:
+    """
+    LLM-free summarizer: appends the first sentence of every folded message
+    and drops the oldest lines beyond ``max_words``.
+    """
+    lines = summary.split("\n") if summary else []
+    for message in messages:
+        sentences = split_sentences(message["content"])
+        if sentences:
+            lines.append(render_messages([{"role": message["role"], "content": sentences[0]}]))
+    while len(lines) > 1 and sum(len(line.split()) for line in lines) > max_words:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """
+    One conversation's turns, kept under a token budget. ``add`` only
+    appends; ``compact`` folds the oldest turns into a running summary once
+    the history is over ``max_tokens``, and is meant to run after the answer
+    has gone out (LLMHandler runs it on a background thread). Each
+    compaction shrinks the history to half the budget, so the next few
+    turns are added without folding again. Until a pending compaction
+    catches up, ``render()`` and ``history()`` leave out the oldest
+    unsummarized messages, so prompts built from them stay within the
+    budget however long the conversation runs.
+    """
+
+    def __init__(self, max_tokens: int = 1024, keep_recent: int = 4,
+                 count_tokens: Optional[Callable[[str], int]] = None,
+                 summarize: Optional[Callable[[str, List[Message], int], str]] = None):
+        """
+        :param max_tokens: Budget for the summary plus the kept messages.
+        :param keep_recent: Messages kept verbatim when older ones are folded.
+        :param count_tokens: Text -> token count; defaults to llama-index's tokenizer.
+        :param summarize: (summary, folded messages, max words) -> new summary; defaults to extractive_summary.
+        """
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        if count_tokens is None:
+            from chunking import default_tokenizer
+            tokenizer = default_tokenizer()
+            count_tokens = lambda text: len(tokenizer(text))
+        self.count_tokens = count_tokens
+        self.summarize = summarize or extractive_summary
+        self.summary = ""
+        self.messages: List[Message] = []
+        self.summaries = 0
+        self.compacting = False
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def _tokens(self) -> int:
+        return self.count_tokens(self.summary) + sum(self.count_tokens(m["content"]) for m in self.messages)
+
+    def _clip(self, text: str, max_tokens: int, keep_end: bool) -> str:
+        # longest run of whole words, from the start or the end, that fits
+        words = text.split()
+        low, high = 0, len(words)
+        while low < high:
+            mid = (low + high + 1) // 2
+            candidate = words[-mid:] if keep_end else words[:mid]
+            if self.count_tokens(" ".join(candidate)) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return " ".join(words[-low:] if keep_end else words[:low]) if low else ""
+
+    def _view(self) -> List[Message]:
+        # the newest messages that fit next to the summary; a single oversized message keeps its beginning
+        budget = self.max_tokens - self.count_tokens(self.summary)
+        view: List[Message] = []
+        for message in reversed(self.messages):
+            tokens = self.count_tokens(message["content"])
+            if tokens > budget:
+                if not view:
+                    view.append({**message, "content": self._clip(message["content"], budget, keep_end=False)})
+                break
+            view.insert(0, dict(message))
+            budget -= tokens
+        return view
+
+    def add(self, role: str, content: str):
+        with self.lock:
+            self.messages.append({"role": role, "content": content})
+
+    def needs_compaction(self) -> bool:
+        with self.lock:
+            return not self.compacting and self._tokens() > self.max_tokens
+
+    def compact(self):
+        """
+        Folds the oldest turns into the summary when the history is over
+        budget: afterwards the summary and the kept messages take at most a
+        quarter of the budget each. The summarize call runs without the lock
+        held, so the conversation keeps answering meanwhile.
+        """
+        quarter = max(1, self.max_tokens // 4)
+        with self.lock:
+            if self.compacting or self._tokens() <= self.max_tokens:
+                return
+            kept = 0
+            kept_tokens = 0
+            for message in reversed(self.messages[-self.keep_recent:] if self.keep_recent else []):
+                kept_tokens += self.count_tokens(message["content"])
+                if kept_tokens > quarter:
+                    break
+                kept += 1
+            folded = self.messages[:len(self.messages) - kept]
+            if not folded:
+                return
+            summary = self.summary
+            generation = self.generation
+            self.compacting = True
+
+        new_summary = None
+        try:
+            new_summary = self.summarize(summary, folded, quarter).strip()
+            if self.count_tokens(new_summary) > quarter:
+                new_summary = self._clip(new_summary, quarter, keep_end=True)
+        finally:
+            with self.lock:
+                self.compacting = False
+                # messages added meanwhile stay; a clear() meanwhile discards the result
+                if new_summary is not None and generation == self.generation:
+                    self.summary = new_summary
+                    del self.messages[:len(folded)]
+                    self.summaries += 1
+
+    def history(self) -> List[Message]:
+        """
+        The summary (as a system message) followed by the kept messages.
+        """
+        with self.lock:
+            summary = [{"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}] if self.summary else []
+            return summary + self._view()
+
+    def render(self) -> str:
+        with self.lock:
+            parts = [f"Summary: {self.summary}"] if self.summary else []
+            messages = self._view()
+            if messages:
+                parts.append(render_messages(messages))
+            return "\n".join(parts)
+
+    def is_empty(self) -> bool:
+        with self.lock:
+            return not self.messages and not self.summary
+
+    def clear(self):
+        with self.lock:
+            self.summary = ""
+            self.messages = []
+            self.generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"messages": len(self.messages), "tokens": self._tokens(), "summaries": self.summaries}
+
+
+def llm_summarizer(complete: Callable[[str], str]) -> Callable[[str, List[Message], int], str]:
+    """
+    ConversationMemory summarizer backed by an LLM completion function;
+    falls back to extractive_summary when the call fails.
+    """
+    def summarize(summary: str, messages: List[Message], max_words: int) -> str:
+        prompt = SUMMARY_PROMPT.format(max_words=max_words, summary=summary or "(none)",
+                                       messages=render_messages(messages))
+        try:
+            return complete(prompt)
+        except Exception:
+            return extractive_summary(summary, messages, max_words)
+    return summarize
+
+
+def condense_question(memory: ConversationMemory, question: str, complete: Callable[[str], str]) -> str:
+    """
+    Rewrites a follow-up into a standalone question using the conversation
+    so far. The result drives retrieval and the answer cache, so "and for
+    contractors?" after a question about holidays is answered (and cached) as
+    the full question. Questions without follow-up markers, and everything
+    when the call fails, pass through unchanged.
+    """
+    if memory.is_empty() or not looks_like_followup(question):
+        return question
+    try:
+        condensed = complete(CONDENSE_PROMPT.format(conversation=memory.render(), question=question)).strip()
+    except Exception:
+        return question
+    return condensed.splitlines()[0].strip() if condensed else question
+
+
+class ConversationStore:
+    """
+    Per-session ConversationMemory objects, least recently used evicted past ``max_sessions``.
+    """
+
+    def __init__(self, factory: Callable[[], ConversationMemory], max_sessions: int = 1000):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, session_id: str) -> ConversationMemory:
+        with self.lock:
+            memory = self.sessions.get(session_id)
+            if memory is None:
+                memory = self.sessions[session_id] = self.factory()
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            else:
+                self.sessions.move_to_end(session_id)
+            return memory
+
+    def drop(self, session_id: str):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.sessions)
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent text -> vector cache for one embedding model. Vectors are rows
+    of a float32 matrix memory-mapped from ``<model>.f32``; an SQLite index
+    maps sha256(model, text) to its row. Rows are written and flushed before
+    the index references them, so a crash can waste a row but never return
+    a wrong vector. The matrix grows by doubling and is never compacted;
+    clear() starts over.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], model_name: str, initial_capacity: int = 1024):
+        """
+        :param cache_dir: Directory holding the matrix and index files.
+        :param model_name: Embedding model; part of every key, so models never share vectors.
+        :param initial_capacity: Rows allocated when the matrix is created.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.initial_capacity = initial_capacity
+        slug = re.sub(r"[^\w.-]", "_", model_name)
+        self.matrix_path = self.cache_dir / f"{slug}.f32"
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(self.cache_dir / f"{slug}.db"), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self.dim: Optional[int] = int(row[0]) if row else None
+        self.rows = self.conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM vectors").fetchone()[0]
+        self.matrix: Optional[np.memmap] = None
+        if self.dim is not None and self.matrix_path.exists():
+            self._open_matrix()
+
+    def _open_matrix(self):
+        capacity = self.matrix_path.stat().st_size // (4 * self.dim)
+        self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _reserve(self, n: int):
+        capacity = 0 if self.matrix is None else self.matrix.shape[0]
+        if self.rows + n <= capacity:
+            return
+        new_capacity = max(capacity * 2, self.rows + n, self.initial_capacity)
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._open_matrix()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode()).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Cached vectors for ``texts`` in order, None where a text has not been embedded yet.
+        """
+        keys = [self.key(text) for text in texts]
+        rows: Dict[str, int] = {}
+        with self.lock:
+            if self.matrix is None:
+                return [None] * len(texts)
+            # stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.update(self.conn.execute(f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", chunk))
+            return [np.array(self.matrix[rows[key]]) if key in rows else None for key in keys]
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Any]):
+        if not texts:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        with self.lock:
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (str(self.dim),))
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors for {self.model_name}, got {matrix.shape[1]}")
+            self._reserve(len(texts))
+            first = self.rows
+            self.matrix[first:first + len(texts)] = matrix
+            self.matrix.flush()
+            self.rows += len(texts)
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, row) VALUES (?, ?)",
+                [(self.key(text), first + i) for i, text in enumerate(texts)]
+            )
+            self.conn.execute("COMMIT")
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM vectors")
+            self.conn.execute("DELETE FROM meta")
+            self.matrix = None
+            self.matrix_path.unlink(missing_ok=True)
+            self.dim = None
+            self.rows = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "entries": len(self),
+            "dim": self.dim,
+            "file_bytes": self.matrix_path.stat().st_size if self.matrix_path.exists() else 0,
+        }
+
+    def close(self):
+        with self.lock:
+            if self.matrix is not None:
+                self.matrix.flush()
+            self.conn.close()
+
+
+class CachedEmbeddingFunction:
+    """
+    Chroma-style embedding function (list of texts -> list of vectors) that
+    only encodes texts missing from an EmbeddingCache, ``batch_size`` texts
+    per call to the wrapped function.
+    """
+
+    def __init__(self, embedding_function: Callable[[List[str]], Any], cache: EmbeddingCache, batch_size: int = 32):
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+
+    # chroma validates the parameter name, so it has to be `input`
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        texts = list(input)
+        vectors = self.cache.get_many(texts)
+        # duplicates within one call are encoded once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        encoded: Dict[str, np.ndarray] = {}
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            batch_vectors = [np.asarray(v, dtype=np.float32) for v in self.embedding_function(batch)]
+            self.cache.put_many(batch, batch_vectors)
+            encoded.update(zip(batch, batch_vectors))
+        self.hits += len(texts) - sum(vector is None for vector in vectors)
+        self.misses += len(missing)
+        return [vector if vector is not None else encoded[text] for text, vector in zip(texts, vectors)]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            **self.cache.stats(),
+            "batch_size": self.batch_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def llama_index_embedding(documents_function: Callable[[List[str]], Any],
+                          query_function: Callable[[List[str]], Any], model_name: str, batch_size: int = 32):
+    """
+    Wraps Chroma-style embedding functions as a llama-index embed model, so
+    the index embeds nodes with the same (cached) model the collection uses
+    instead of llama-index's default. Node texts go through
+    ``documents_function``; questions go through ``query_function``, which
+    keeps one-off queries out of the persistent cache.
+    """
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.bridge.pydantic import PrivateAttr
+
+    class ChromaFunctionEmbedding(BaseEmbedding):
+        _documents_function: Any = PrivateAttr()
+        _query_function: Any = PrivateAttr()
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._documents_function = documents_function
+            self._query_function = query_function
+
+        def _get_query_embedding(self, query: str) -> List[float]:
+            return np.asarray(self._query_function([query])[0], dtype=np.float32).tolist()
+
+        async def _aget_query_embedding(self, query: str) -> List[float]:
+            # encoding is CPU-bound; keep it off the event loop
+            return await asyncio.to_thread(self._get_query_embedding, query)
+
+        def _get_text_embedding(self, text: str) -> List[float]:
+            return self._get_text_embeddings([text])[0]
+
+        def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+            return [np.asarray(vector, dtype=np.float32).tolist() for vector in self._documents_function(texts)]
+
+    return ChromaFunctionEmbedding(model_name=model_name, embed_batch_size=batch_size)
@@ -1,13 +1,15 @@
 import streamlit as st
-from llama_index.core import VectorStoreIndex
+from llama_index.core import Settings, VectorStoreIndex
 from llama_index.readers.notion import NotionPageReader
 from dotenv import load_dotenv
 import os
 import logging
 import sys
+import threading
 import torch
 import util
 from Chroma import ChromaHandler
+from conversation import ConversationMemory, condense_question, llm_summarizer
 
 torch.classes.__path__ = [os.path.join(torch.__path__[0], torch.classes.__file__)] 
 
@@ -38,16 +40,22 @@ def get_chroma_index():
     page_ids = util.extract_notion_ids()[:3]
     documents = reader.load_data(page_ids=page_ids)
     logging.info(f"Loaded {len(documents)} documents")
-    # Create index
-    index = VectorStoreIndex(documents, storage_context=chroma_db.storage_context)
+    # Create index; the collection holds MiniLM vectors, so nodes and questions are embedded with the same model
+    index = VectorStoreIndex(documents, storage_context=chroma_db.storage_context, embed_model=chroma_db.embed_model)
     return index
 
 index = get_chroma_index()
 query_engine = index.as_query_engine()
 
-# Chat History
+def complete(prompt):
+    return Settings.llm.complete(prompt).text.strip()
+
+# Chat History: `messages` is the transcript shown on screen; `memory` is what follow-ups are condensed
+# against, kept under a token budget by summarizing older turns
 if 'messages' not in st.session_state:
     st.session_state.messages = []
+if 'memory' not in st.session_state:
+    st.session_state.memory = ConversationMemory(max_tokens=1024, summarize=llm_summarizer(complete))
 
 # Display chat history
 for message in st.session_state.messages:
@@ -62,7 +70,9 @@ if user_input:
 
     # Get the answer
     with st.spinner("Thinking..."):
-        response = query_engine.query(user_input)
+        # follow-ups ("and for contractors?") are rewritten into standalone questions before retrieval
+        question = condense_question(st.session_state.memory, user_input, complete)
+        response = query_engine.query(question)
         answer = response.response
 
         # Show bot answer
@@ -71,4 +81,9 @@ if user_input:
         # Add user and bot messages to session state for history
         st.session_state.messages.append({"role": "user", "content": user_input})
         st.session_state.messages.append({"role": "assistant", "content": answer})
+        st.session_state.memory.add("user", user_input)
+        st.session_state.memory.add("assistant", answer)
+        if st.session_state.memory.needs_compaction():
+            # the answer is already on screen; older turns are summarized without holding up the next question
+            threading.Thread(target=st.session_state.memory.compact, daemon=True).start()
 
@@ -34,7 +34,8 @@ documents = NotionPageReader(integration_token=integration_token).load_data(
 )
 
 print('create index')
-index = VectorStoreIndex(documents, storage_context=chroma_db.storage_context)
+# same embedding model as the rest of the 'rocky' collection, for indexing and querying alike
+index = VectorStoreIndex(documents, storage_context=chroma_db.storage_context, embed_model=chroma_db.embed_model)
 # index = VectorStoreIndex.from_documents(
 #     documents,
 #     chunk_size=1024,  
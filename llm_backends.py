@@ -0,0 +1,128 @@
+import os
+from typing import Any, Dict, Optional, Type
+
+
+class LLMBackend:
+    """
+    Builds the llama-index LLM that LLMHandler answers with. ``create``
+    returns None to keep llama-index's default (hosted OpenAI) model.
+    Integrations are imported inside ``create`` so only the selected one has
+    to be installed.
+    """
+
+    name = "base"
+
+    def create(self) -> Optional[Any]:
+        raise NotImplementedError
+
+
+class DefaultLLMBackend(LLMBackend):
+    """llama-index's default hosted model (needs OPENAI_API_KEY)."""
+
+    name = "default"
+
+    def create(self):
+        return None
+
+
+class LocalLLMBackend(LLMBackend):
+    """
+    A GGUF model run on the CPU through llama.cpp (pip install
+    llama-index-llms-llama-cpp). No network round trips; latency depends on
+    the model size and the thread count.
+    """
+
+    name = "local"
+
+    def __init__(self, model_path: Optional[str] = None, n_threads: Optional[int] = None,
+                 context_window: int = 4096, max_new_tokens: int = 256, temperature: float = 0.1):
+        """
+        :param model_path: GGUF file; defaults to the LOCAL_LLM_MODEL_PATH environment variable.
+        :param n_threads: CPU threads for inference; defaults to every core.
+        :param context_window: Tokens of prompt plus answer the model is run with.
+        :param max_new_tokens: Longest answer generated.
+        :param temperature: Sampling temperature.
+        """
+        self.model_path = model_path or os.getenv("LOCAL_LLM_MODEL_PATH")
+        if not self.model_path:
+            raise ValueError("The local LLM backend needs a model path (set LOCAL_LLM_MODEL_PATH)")
+        self.n_threads = n_threads or os.cpu_count()
+        self.context_window = context_window
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+
+    def create(self):
+        from llama_index.llms.llama_cpp import LlamaCPP
+        return LlamaCPP(
+            model_path=self.model_path,
+            temperature=self.temperature,
+            max_new_tokens=self.max_new_tokens,
+            context_window=self.context_window,
+            model_kwargs={"n_threads": self.n_threads, "n_gpu_layers": 0},
+            verbose=False,
+        )
+
+
+class OpenAILikeBackend(LLMBackend):
+    """
+    Any OpenAI-compatible endpoint, e.g. llm_standin_server.py, a vLLM or a
+    llama.cpp server (pip install llama-index-llms-openai-like). Sync and async
+    requests go through pooled HTTP clients with explicit connect and read timeouts.
+    """
+
+    name = "openai-like"
+
+    def __init__(self, base_url: Optional[str] = None, model: Optional[str] = None, api_key: Optional[str] = None,
+                 timeout: float = 60.0, connect_timeout: float = 5.0, max_connections: int = 20,
+                 max_retries: int = 2, context_window: int = 4096):
+        """
+        :param base_url: API root including /v1; defaults to LLM_BASE_URL, then a local stand-in server.
+        :param model: Model name sent with each request; defaults to LLM_MODEL.
+        :param api_key: Defaults to LLM_API_KEY; stand-in servers accept anything.
+        :param timeout: Seconds to wait for a response (or the next streamed chunk).
+        :param connect_timeout: Seconds to wait for a connection.
+        :param max_connections: Size of the connection pool, which also bounds concurrent requests.
+        :param max_retries: Retries on connection errors and 5xx responses.
+        :param context_window: Tokens the served model accepts.
+        """
+        self.base_url = base_url or os.getenv("LLM_BASE_URL", "http://127.0.0.1:8008/v1")
+        self.model = model or os.getenv("LLM_MODEL", "standin")
+        self.api_key = api_key or os.getenv("LLM_API_KEY", "not-needed")
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.context_window = context_window
+
+    def create(self):
+        import httpx
+        from llama_index.llms.openai_like import OpenAILike
+        timeout = httpx.Timeout(self.timeout, connect=self.connect_timeout)
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        # the async query path (aask_question, astream_answer) gets its own pool with the same limits
+        http_client = httpx.Client(timeout=timeout, limits=limits)
+        async_http_client = httpx.AsyncClient(timeout=timeout, limits=limits)
+        return OpenAILike(
+            api_base=self.base_url,
+            model=self.model,
+            api_key=self.api_key,
+            is_chat_model=True,
+            context_window=self.context_window,
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            http_client=http_client,
+            async_http_client=async_http_client,
+        )
+
+
+LLM_BACKENDS: Dict[str, Type[LLMBackend]] = {
+    DefaultLLMBackend.name: DefaultLLMBackend,
+    LocalLLMBackend.name: LocalLLMBackend,
+    OpenAILikeBackend.name: OpenAILikeBackend,
+}
+
+
+def create_llm_backend(name: str, **options) -> LLMBackend:
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name}. Choose from {list(LLM_BACKENDS)}")
+    return LLM_BACKENDS[name](**options)
@@ -1,41 +1,119 @@
 import os
+import asyncio
 import logging
 import json
 import hashlib
 import time
 import pickle
+import queue
+import threading
+import weakref
 from pathlib import Path
-from typing import Optional, Dict, Any, Union, List
+from typing import TYPE_CHECKING, Optional, Dict, Any, Union, List, Tuple, Iterator, AsyncIterator
 from dotenv import load_dotenv
-from llama_index.core import VectorStoreIndex, Document, PromptTemplate
-from llama_index.readers.notion import NotionPageReader
 from Chroma import ChromaHandler
+from notion_loader import ConcurrentNotionReader, NotionClient, TokenBucket
+from notion_sync import NotionSync, content_hash
+from semantic_cache import SemanticCache, normalize_question
+from single_flight import SingleFlight
+from cache_store import open_cache_store
+from chunking import StructureChunker, structure_node_parser, token_budget_postprocessor
+from conversation import ConversationMemory, ConversationStore, condense_question, llm_summarizer
+from llm_backends import create_llm_backend
+from metrics import LatencyStats
 import util
-import requests
-from requests.exceptions import RequestException, ProxyError, ConnectionError
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+
+# llama_index takes seconds to import; defer it until an index is actually built or queried
+llama_core = util.lazy_import("llama_index.core")
 
 class LLMHandler:
-    def __init__(self, collection_name: str = "rocky", cache_dir: str = "llm_cache", force_reload: bool = False):
+    def __init__(self, collection_name: str = "rocky", cache_dir: str = "llm_cache", force_reload: bool = False,
+                 warm_start: bool = True, semantic_cache: bool = True, semantic_threshold: float = 0.92,
+                 cache_backend: str = "sqlite", structured_chunking: bool = True, llm_backend: str = "default"):
         load_dotenv()
         logging.basicConfig(level=logging.INFO)
         
+        started = time.perf_counter()
+        self.startup_timings: Dict[str, float] = {}
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
-        self.response_cache_file = self.cache_dir / "response_cache.json"
         self.embedding_cache_file = self.cache_dir / "embedding_cache.json"
         self.documents_cache_file = self.cache_dir / "documents_cache.pkl"
+        self.index_manifest_file = self.cache_dir / "index_manifest.json"
         
-        self.response_cache = self._load_cache(self.response_cache_file)
+        self.response_cache_max_entries = 10000
+        self.response_cache_max_bytes = 50 * 1024 * 1024
+        self.response_cache_ttl = 30 * 24 * 60 * 60
+        self.response_cache = open_cache_store(
+            cache_backend,
+            self.cache_dir,
+            max_entries=self.response_cache_max_entries,
+            max_bytes=self.response_cache_max_bytes,
+            ttl=self.response_cache_ttl
+        )
         self.embedding_cache = self._load_cache(self.embedding_cache_file)
+        self.index_manifest = self._load_cache(self.index_manifest_file)
+        self.startup_timings["caches"] = time.perf_counter() - started
+        
+        self.collection_name = collection_name
+        self.warm_start = warm_start
+        stage_start = time.perf_counter()
+        self.chroma_db = ChromaHandler(collection_name, embedding_cache_dir=self.cache_dir / "embeddings")
+        self.startup_timings["vector_store"] = time.perf_counter() - stage_start
         
-        self.chroma_db = ChromaHandler(collection_name)
+        self.semantic_cache = None
+        if semantic_cache:
+            self.semantic_cache = SemanticCache(self.chroma_db.encoder, threshold=semantic_threshold)
+            self.semantic_cache.load(self.response_cache.iter_embeddings())
+        self.cache_stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self.cache_stats_lock = threading.Lock()
+        self.cache_lookup_latency = LatencyStats()
+        # concurrent askers of the same (normalized) question share one lookup and LLM query
+        self.in_flight = SingleFlight()
         
         self.max_notion_retries = 5
-        self.notion_retry_delay = 3
+        self.notion_requests_per_second = 3.0
+        self.notion_max_workers = 4
+        self.max_notion_pages = 10
+        self.notion_sync = None
         
+        # Age after which startup runs an incremental Notion sync
         self.cache_expiration = 24 * 60 * 60
         
-        self.friendly_prompt_template = PromptTemplate(
+        # Nodes follow the pages' headings, lists and tables; retrieved context is trimmed to a token budget
+        self.structured_chunking = structured_chunking
+        self.chunk_size = 512
+        self.chunk_overlap = 64
+        self.context_token_budget = 1500  # None sends retrieved nodes untrimmed
+        self.chunker = StructureChunker(self.chunk_size, self.chunk_overlap)
+        
+        # None keeps llama-index's default hosted model
+        self.llm_backend = create_llm_backend(llm_backend)
+        self.llm = self.llm_backend.create()
+        
+        # Questions the async API keeps in flight at once; the rest wait for a slot
+        self.max_concurrent_queries = 32
+        self._query_semaphores: "weakref.WeakKeyDictionary[Any, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        
+        # Per-session chat history; older turns are summarized so follow-up prompts stay this size
+        self.chat_history_max_tokens = 1024
+        self.chat_history_keep_recent = 4
+        self.conversations = ConversationStore(lambda: ConversationMemory(
+            self.chat_history_max_tokens,
+            self.chat_history_keep_recent,
+            count_tokens=self.chunker.count_tokens,
+            summarize=llm_summarizer(self._complete)
+        ))
+        # summarizing older turns happens on this worker, after the answer has been returned. It is a daemon,
+        # so a hung summarize call cannot hold up interpreter exit; close() stops it
+        self.history_compactions: "queue.Queue[Optional[ConversationMemory]]" = queue.Queue()
+        self.history_compactor = threading.Thread(target=self._compact_histories, name="history", daemon=True)
+        self.history_compactor.start()
+        
+        self.friendly_prompt_template = llama_core.PromptTemplate(
             """Hey! You are rocky. The new friendly, cool and helpful AI assistant for the company Rockfeather. Your goal is to provide accurate, 
             informative, and friendly responses to user questions. Use a conversational tone 
             and be encouraging in your responses.
@@ -53,6 +131,7 @@ class LLMHandler:
             Friendly Answer: """
         )
         
+        stage_start = time.perf_counter()
         if force_reload or self._should_initialize_index():
             self._initialize_index()
             self._save_embedding_cache()
@@ -60,26 +139,45 @@ class LLMHandler:
         else:
             logging.info("Using cached documents. Skipping Notion API calls.")
             self._load_index_from_cache()
+            if self._should_sync():
+                self.sync_notion_pages()
+        self.startup_timings["index"] = time.perf_counter() - stage_start
+        self.startup_timings["total"] = time.perf_counter() - started
+        
+    def _notion_page_ids(self) -> List[str]:
+        return util.extract_notion_ids()[:self.max_notion_pages]
+        
+    def _get_notion_sync(self) -> NotionSync:
+        if self.notion_sync is None:
+            client = NotionClient(
+                integration_token=os.getenv("NOTION_API_KEY"),
+                rate_limiter=TokenBucket(rate=self.notion_requests_per_second),
+                max_retries=self.max_notion_retries,
+                pool_size=self.notion_max_workers
+            )
+            reader = ConcurrentNotionReader(client, max_workers=self.notion_max_workers)
+            self.notion_sync = NotionSync(reader)
+        return self.notion_sync
         
     def _should_initialize_index(self) -> bool:
         if not self.embedding_cache:
             return True
             
-        current_page_ids = util.extract_notion_ids()[:10]
-        cached_page_ids = self.embedding_cache.get("page_ids", [])
-        
-        if current_page_ids != cached_page_ids:
-            logging.info("Notion pages have changed. Reinitializing index.")
+        if not self.documents_cache_file.exists():
+            logging.info("Documents cache file not found. Reinitializing index.")
             return True
             
-        cache_timestamp = self.embedding_cache.get("timestamp", 0)
-        current_time = time.time()
-        if current_time - float(cache_timestamp) > self.cache_expiration:
-            logging.info("Cache has expired. Reinitializing index.")
+        return False
+        
+    def _should_sync(self) -> bool:
+        cached_page_ids = self.embedding_cache.get("page_ids", [])
+        if self._notion_page_ids() != cached_page_ids:
+            logging.info("Notion page list has changed. Syncing changed pages.")
             return True
             
-        if not self.documents_cache_file.exists():
-            logging.info("Documents cache file not found. Reinitializing index.")
+        cache_timestamp = self.embedding_cache.get("timestamp", 0)
+        if time.time() - float(cache_timestamp) > self.cache_expiration:
+            logging.info("Cache has expired. Syncing changed pages.")
             return True
             
         return False
@@ -96,13 +194,15 @@ class LLMHandler:
         
     def _save_cache(self, cache: Dict, cache_file: Path):
         try:
-            with open(cache_file, 'w') as f:
+            tmp_file = cache_file.with_suffix(cache_file.suffix + ".tmp")
+            with open(tmp_file, 'w') as f:
                 json.dump(cache, f)
+            os.replace(tmp_file, cache_file)
         except Exception as e:
             logging.error(f"Error saving cache file {cache_file}: {e}")
             
     def _save_embedding_cache(self):
-        page_ids = util.extract_notion_ids()[:10]
+        page_ids = self._notion_page_ids()
         
         cache_entry = {
             "page_ids": page_ids,
@@ -120,6 +220,88 @@ class LLMHandler:
         except Exception as e:
             logging.error(f"Error saving documents cache: {e}")
         
+    def _document_key(self, doc: "Document") -> str:
+        return doc.metadata.get("page_id", doc.doc_id)
+        
+    def _loaded_documents(self) -> List["Document"]:
+        # placeholders for pages that failed to load are neither embedded nor recorded, so the next sync retries them
+        return [doc for doc in self.documents if not doc.metadata.get("error")]
+        
+    def _document_hashes(self, documents: List["Document"]) -> Dict[str, str]:
+        return {self._document_key(doc): content_hash(doc.text) for doc in documents if not doc.metadata.get("error")}
+        
+    def _save_index_manifest(self, last_edited: Optional[Dict[str, str]] = None):
+        hashes = self._document_hashes(self.documents)
+        if last_edited is None:
+            last_edited = self.index_manifest.get("last_edited", {})
+            
+        previous_hashes = self.index_manifest.get("documents", {})
+        corpus_version = self.index_manifest.get("corpus_version", 0)
+        if hashes != previous_hashes:
+            corpus_version += 1
+            changed_pages = [page_id for page_id in previous_hashes if hashes.get(page_id) != previous_hashes[page_id]]
+            self._invalidate_answers(changed_pages)
+            
+        self.index_manifest = {
+            "collection_name": self.collection_name,
+            "embed_model": self.chroma_db.model_name,
+            "chunking": self._chunking_config(),
+            "corpus_version": corpus_version,
+            "documents": hashes,
+            "last_edited": {page_id: t for page_id, t in last_edited.items() if page_id in hashes},
+            "node_count": self.chroma_db.count(),
+            "timestamp": str(time.time())
+        }
+        self._save_cache(self.index_manifest, self.index_manifest_file)
+        
+    def _can_warm_start(self) -> bool:
+        if not self.warm_start or not self.index_manifest:
+            return False
+            
+        if self.index_manifest.get("collection_name") != self.collection_name:
+            logging.info("Index manifest belongs to another collection. Rebuilding index.")
+            return False
+            
+        if self.index_manifest.get("embed_model") != self.chroma_db.model_name:
+            # vectors from another model are not comparable with the query embeddings
+            logging.info("Persisted collection was embedded with another model. Rebuilding index.")
+            return False
+            
+        if self.index_manifest.get("chunking") != self._chunking_config():
+            logging.info("Persisted collection was chunked with other settings. Rebuilding index.")
+            return False
+            
+        if self.index_manifest.get("documents") != self._document_hashes(self.documents):
+            logging.info("Cached documents differ from the index manifest. Rebuilding index.")
+            return False
+            
+        node_count = self.chroma_db.count()
+        if node_count == 0 or node_count != self.index_manifest.get("node_count"):
+            logging.info("Persisted collection does not match the index manifest. Rebuilding index.")
+            return False
+            
+        return True
+        
+    def _chunking_config(self) -> Dict[str, Any]:
+        return {"structured": self.structured_chunking, "chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
+        
+    def _transformations(self) -> Optional[List[Any]]:
+        # None keeps llama-index's default sentence splitter
+        if not self.structured_chunking:
+            return None
+        return [structure_node_parser(self.chunker)]
+        
+    def _build_index(self, last_edited: Optional[Dict[str, str]] = None):
+        # Start from an empty collection so rebuilt nodes do not pile up next to stale ones
+        self.chroma_db.reset_collection()
+        self.index = llama_core.VectorStoreIndex.from_documents(
+            self._loaded_documents(), 
+            storage_context=self.chroma_db.storage_context,
+            embed_model=self.chroma_db.embed_model,
+            transformations=self._transformations()
+        )
+        self._save_index_manifest(last_edited)
+        
     def _load_index_from_cache(self):
         try:
             if self.documents_cache_file.exists():
@@ -127,14 +309,18 @@ class LLMHandler:
                     self.documents = pickle.load(f)
                 logging.info(f"Loaded {len(self.documents)} documents from cache.")
                 
-                self.index = VectorStoreIndex.from_documents(
-                    self.documents, 
-                    storage_context=self.chroma_db.storage_context
-                )
-                self.query_engine = self.index.as_query_engine(
-                    text_qa_template=self.friendly_prompt_template
-                )
-                logging.info("Index created from cached documents successfully.")
+                if self._can_warm_start():
+                    self.index = llama_core.VectorStoreIndex.from_vector_store(
+                        self.chroma_db.vector_store,
+                        embed_model=self.chroma_db.embed_model,
+                        transformations=self._transformations()
+                    )
+                    logging.info("Attached to persisted Chroma collection. No documents re-embedded.")
+                else:
+                    self._build_index()
+                    logging.info("Index created from cached documents successfully.")
+                    
+                self._create_query_engines()
             else:
                 logging.warning("Documents cache file not found. Initializing new index.")
                 self._initialize_index()
@@ -146,59 +332,371 @@ class LLMHandler:
             self._save_documents_cache()
         
     def _initialize_index(self):
-        integration_token = os.getenv("NOTION_API_KEY")
-        
-        reader = NotionPageReader(integration_token=integration_token)
-        retry_reader = RetryNotionReader(
-            reader=reader,
-            max_retries=self.max_notion_retries,
-            retry_delay=self.notion_retry_delay
-        )
-        
-        page_ids = util.extract_notion_ids()[:10]
-        self.documents = retry_reader.load_data(page_ids=page_ids)
+        notion_sync = self._get_notion_sync()
+        page_ids = self._notion_page_ids()
+        # Recorded before loading so edits made during the load are picked up by the next sync
+        edited_times = notion_sync.fetch_last_edited_times(page_ids)
+        self.documents = notion_sync.reader.load_data(page_ids=page_ids)
         logging.info(f"Loaded {len(self.documents)} documents")
         
-        self.index = VectorStoreIndex.from_documents(
-            self.documents, 
-            storage_context=self.chroma_db.storage_context
-        )
+        loaded = {self._document_key(doc) for doc in self._loaded_documents()}
+        last_edited = {page_id: t for page_id, t in edited_times.items() if t is not None and page_id in loaded}
+        self._build_index(last_edited)
+        self._create_query_engines()
+        
+    def _create_query_engines(self):
+        node_postprocessors = []
+        if self.context_token_budget:
+            node_postprocessors.append(token_budget_postprocessor(self.context_token_budget, self.chunker.count_tokens))
         self.query_engine = self.index.as_query_engine(
-            text_qa_template=self.friendly_prompt_template
+            llm=self.llm,
+            text_qa_template=self.friendly_prompt_template,
+            node_postprocessors=node_postprocessors
+        )
+        self.streaming_query_engine = self.index.as_query_engine(
+            llm=self.llm,
+            text_qa_template=self.friendly_prompt_template,
+            node_postprocessors=node_postprocessors,
+            streaming=True
         )
         
     def _generate_cache_key(self, question: str) -> str:
-        return hashlib.md5(question.encode()).hexdigest()
+        return hashlib.md5(normalize_question(question).encode()).hexdigest()
         
-    def ask_question(self, question: str) -> str:
+    def _count(self, stat: str):
+        # lookups run on worker threads under the async API
+        with self.cache_stats_lock:
+            self.cache_stats[stat] += 1
+            
+    def _lookup_cached_answer(self, question: str) -> Tuple[Optional[str], Any]:
+        """
+        Returns the cached answer (or None) and the question's embedding when
+        the semantic cache computed one, so a miss does not embed twice.
+        """
+        start = time.perf_counter()
+        try:
+            answer = self.response_cache.get(self._generate_cache_key(question))
+            if answer is not None:
+                self._count("exact_hits")
+                logging.info(f"Using cached response for question: {question}")
+                return answer, None
+                
+            vector = None
+            if self.semantic_cache is not None:
+                vector = self.semantic_cache.embed(normalize_question(question))
+                match = self.semantic_cache.lookup(normalize_question(question), vector)
+                if match is not None:
+                    answer = self.response_cache.get(match[0])
+                    if answer is not None:
+                        self._count("semantic_hits")
+                        logging.info(f"Using semantically cached response (similarity {match[1]:.3f}) for question: {question}")
+                        return answer, vector
+                    # The answer expired in the store; drop its stale vector
+                    self.semantic_cache.remove([match[0]])
+                    
+            self._count("misses")
+            return None, vector
+        finally:
+            self.cache_lookup_latency.record(time.perf_counter() - start)
+            
+    def _answer_sources(self, response: Any) -> Dict[str, str]:
+        """
+        Maps every page the response's retrieved nodes came from to that page's
+        content hash in the current corpus.
+        """
+        corpus_hashes = self.index_manifest.get("documents", {})
+        sources = {}
+        for source_node in getattr(response, "source_nodes", None) or []:
+            node = source_node.node
+            page_id = node.metadata.get("page_id") or node.ref_doc_id
+            if page_id:
+                sources[page_id] = corpus_hashes.get(page_id)
+        return sources
+        
+    def _invalidate_answers(self, page_ids: List[str]):
+        if not page_ids:
+            return
+        evicted = self.response_cache.invalidate_pages(page_ids)
+        if self.semantic_cache is not None:
+            self.semantic_cache.remove(evicted)
+        logging.info(f"Evicted {len(evicted)} cached answer(s) that depend on {len(page_ids)} changed page(s).")
+        
+    def _store_answer(self, question: str, answer: str, vector: Any = None, sources: Optional[Dict[str, str]] = None):
         cache_key = self._generate_cache_key(question)
+        if self.semantic_cache is not None and vector is None:
+            vector = self.semantic_cache.embed(normalize_question(question))
+        evicted = self.response_cache.put(
+            cache_key, answer,
+            question=question,
+            embedding=vector,
+            sources=sources,
+            corpus_version=self.index_manifest.get("corpus_version")
+        )
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(cache_key, vector)
+            self.semantic_cache.remove(evicted)
+            
+    def get_cache_stats(self) -> Dict[str, Any]:
+        lookups = sum(self.cache_stats.values())
+        hits = self.cache_stats["exact_hits"] + self.cache_stats["semantic_hits"]
+        stats = dict(self.cache_stats)
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["lookup_latency"] = self.cache_lookup_latency.summary()
+        stats["store"] = self.response_cache.stats()
+        stats["corpus_version"] = self.index_manifest.get("corpus_version", 0)
+        if self.semantic_cache is not None:
+            stats["semantic"] = self.semantic_cache.stats()
+        if hasattr(self.chroma_db.embedding_function, "stats"):
+            stats["embeddings"] = self.chroma_db.embedding_function.stats()
+        stats["single_flight"] = self.in_flight.stats()
+        return stats
         
-        if cache_key in self.response_cache:
-            logging.info(f"Using cached response for question: {question}")
-            return self.response_cache[cache_key]
+    def _apology(self, error: Exception) -> str:
+        logging.error(f"Error querying the LLM: {error}")
+        return f"I'm sorry, I encountered an error while processing your question: {str(error)}"
+    
+    def ask_question(self, question: str) -> str:
+        try:
+            return self._coalesced_answer(question)
+        except Exception as e:
+            return self._apology(e)
+    
+    def _coalesced_answer(self, question: str) -> str:
+        # raises on failure, so a failed leader lands None and its followers query for themselves
+        return self.in_flight.run(self._generate_cache_key(question), lambda: self._ask_question(question))
+    
+    def _ask_question(self, question: str) -> str:
+        cached_answer, question_vector = self._lookup_cached_answer(question)
+        if cached_answer is not None:
+            return cached_answer
             
+        response = self.query_engine.query(question)
+        answer = response.response
+        
+        self._store_answer(question, answer, question_vector, self._answer_sources(response))
+        
+        return answer
+    
+    def stream_answer(self, question: str) -> Iterator[str]:
+        """
+        Yields the answer as it is generated. Cached answers are yielded in one
+        piece; fresh answers are cached once the stream completes. A caller
+        asking while the same question is already being answered waits for
+        that answer and gets it in one piece, like a cache hit.
+        """
         try:
-            response = self.query_engine.query(question)
-            answer = response.response
+            yield from self._coalesced_stream(question)
+        except Exception as e:
+            yield self._apology(e)
+    
+    def _coalesced_stream(self, question: str) -> Iterator[str]:
+        key = self._generate_cache_key(question)
+        flight, leader = self.in_flight.join(key)
+        if not leader:
+            answer = self.in_flight.wait(flight)
+            if answer is not None:
+                yield answer
+                return
+        
+        answer = None
+        try:
+            tokens = []
+            for token in self._stream_answer(question):
+                tokens.append(token)
+                yield token
+            answer = "".join(tokens)
+        finally:
+            # a failed or abandoned stream lands None and its followers answer for themselves
+            if leader:
+                self.in_flight.land(key, flight, answer)
+    
+    def _stream_answer(self, question: str) -> Iterator[str]:
+        cached_answer, question_vector = self._lookup_cached_answer(question)
+        if cached_answer is not None:
+            yield cached_answer
+            return
             
-            self.response_cache[cache_key] = answer
-            self._save_cache(self.response_cache, self.response_cache_file)
+        response = self.streaming_query_engine.query(question)
+        tokens = []
+        for token in response.response_gen:
+            tokens.append(token)
+            yield token
+        
+        self._store_answer(question, "".join(tokens), question_vector, self._answer_sources(response))
+    
+    def _query_semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop, so keep a semaphore per loop
+        loop = asyncio.get_running_loop()
+        if loop not in self._query_semaphores:
+            self._query_semaphores[loop] = asyncio.Semaphore(self.max_concurrent_queries)
+        return self._query_semaphores[loop]
+    
+    async def _aquery(self, engine: Any, question: str) -> Any:
+        # the Chroma lookup and the query embedding are synchronous, so retrieval runs on a worker thread
+        query_bundle = llama_core.QueryBundle(question)
+        nodes = await asyncio.to_thread(engine.retrieve, query_bundle)
+        return await engine.asynthesize(query_bundle, nodes)
+    
+    async def aask_question(self, question: str) -> str:
+        """
+        Async ask_question. Cache lookups and writes (SQLite, embeddings) and
+        retrieval run on worker threads and answer synthesis uses the engine's
+        async path, so one event loop can keep up to max_concurrent_queries
+        questions in flight.
+        """
+        try:
+            return await self.in_flight.arun(self._generate_cache_key(question), lambda: self._aask_question(question))
+        except Exception as e:
+            return self._apology(e)
+    
+    async def _aask_question(self, question: str) -> str:
+        cached_answer, question_vector = await asyncio.to_thread(self._lookup_cached_answer, question)
+        if cached_answer is not None:
+            return cached_answer
             
-            return answer
+        async with self._query_semaphore():
+            response = await self._aquery(self.query_engine, question)
+        answer = response.response
+        
+        await asyncio.to_thread(self._store_answer, question, answer, question_vector, self._answer_sources(response))
+        
+        return answer
+    
+    async def aask_questions(self, questions: List[str]) -> List[str]:
+        """
+        Answers many questions concurrently, in input order, within the concurrency limit.
+        """
+        return list(await asyncio.gather(*(self.aask_question(question) for question in questions)))
+    
+    async def astream_answer(self, question: str) -> AsyncIterator[str]:
+        """
+        Async stream_answer: yields tokens as they are generated without blocking the event loop.
+        """
+        try:
+            async for token in self._acoalesced_stream(question):
+                yield token
         except Exception as e:
-            logging.error(f"Error querying the LLM: {e}")
-            return f"I'm sorry, I encountered an error while processing your question: {str(e)}"
+            yield self._apology(e)
+    
+    async def _acoalesced_stream(self, question: str) -> AsyncIterator[str]:
+        key = self._generate_cache_key(question)
+        flight, leader = self.in_flight.join(key)
+        if not leader:
+            answer = await self.in_flight.await_flight(flight)
+            if answer is not None:
+                yield answer
+                return
+        
+        answer = None
+        try:
+            tokens = []
+            async for token in self._astream_answer(question):
+                tokens.append(token)
+                yield token
+            answer = "".join(tokens)
+        finally:
+            if leader:
+                self.in_flight.land(key, flight, answer)
+    
+    async def _astream_answer(self, question: str) -> AsyncIterator[str]:
+        cached_answer, question_vector = await asyncio.to_thread(self._lookup_cached_answer, question)
+        if cached_answer is not None:
+            yield cached_answer
+            return
+            
+        tokens = []
+        async with self._query_semaphore():
+            response = await self._aquery(self.streaming_query_engine, question)
+            if hasattr(response, "async_response_gen"):
+                async for token in response.async_response_gen():
+                    tokens.append(token)
+                    yield token
+            else:
+                # older llama-index returns a synchronous generator; pull each token on a worker thread
+                token_iterator = iter(response.response_gen)
+                while (token := await asyncio.to_thread(next, token_iterator, None)) is not None:
+                    tokens.append(token)
+                    yield token
+        
+        await asyncio.to_thread(self._store_answer, question, "".join(tokens), question_vector,
+                                self._answer_sources(response))
+    
+    def _complete(self, prompt: str) -> str:
+        # one-off completion (summaries, condensed questions) with the same llm the query engines use
+        llm = self.llm if self.llm is not None else llama_core.Settings.llm
+        return llm.complete(prompt).text.strip()
+    
+    def get_chat_history(self, session_id: str = "default") -> List[Dict[str, str]]:
+        return self.conversations.get(session_id).history()
+    
+    def add_to_chat_history(self, role: str, content: str, session_id: str = "default"):
+        memory = self.conversations.get(session_id)
+        memory.add(role, content)
+        if memory.needs_compaction():
+            self.history_compactions.put(memory)
+        
+    def _compact_histories(self):
+        while (memory := self.history_compactions.get()) is not None:
+            try:
+                memory.compact()
+            except Exception as e:
+                logging.error(f"Error summarizing chat history: {e}")
+    
+    def close(self):
+        """
+        Stops the background history summarizer. A summary still being
+        written is abandoned rather than waited for.
+        """
+        self.history_compactions.put(None)
+        
+    def clear_chat_history(self, session_id: str = "default"):
+        self.conversations.drop(session_id)
     
-    def get_chat_history(self) -> List[Dict[str, str]]:
-        return []
+    def condense_question(self, question: str, session_id: str = "default") -> str:
+        """
+        Rewrites a follow-up into a standalone question from the session's
+        history; questions that do not refer back are returned unchanged.
+        """
+        standalone = condense_question(self.conversations.get(session_id), question, self._complete)
+        if standalone != question:
+            logging.info(f"Condensed follow-up '{question}' to '{standalone}'")
+        return standalone
+    
+    def ask_followup(self, question: str, session_id: str = "default") -> str:
+        """
+        ask_question within a conversation: the question is condensed against
+        the session's history, answered (and cached) as a standalone question,
+        and both turns are added to the history.
+        """
+        try:
+            answer = self._coalesced_answer(self.condense_question(question, session_id))
+        except Exception as e:
+            # failed turns stay out of the history
+            return self._apology(e)
+        self.add_to_chat_history("user", question, session_id)
+        self.add_to_chat_history("assistant", answer, session_id)
+        return answer
     
-    def add_to_chat_history(self, role: str, content: str):
-        pass
+    def stream_followup(self, question: str, session_id: str = "default") -> Iterator[str]:
+        """
+        Streaming ask_followup; the turns are added once the answer is complete.
+        """
+        tokens = []
+        try:
+            for token in self._coalesced_stream(self.condense_question(question, session_id)):
+                tokens.append(token)
+                yield token
+        except Exception as e:
+            yield self._apology(e)
+            return
+        self.add_to_chat_history("user", question, session_id)
+        self.add_to_chat_history("assistant", "".join(tokens), session_id)
         
     def clear_cache(self, cache_type: str = "all"):
         if cache_type in ["all", "response"]:
-            self.response_cache = {}
-            self._save_cache(self.response_cache, self.response_cache_file)
+            self.response_cache.clear()
+            if self.semantic_cache is not None:
+                self.semantic_cache.clear()
             logging.info("Response cache cleared.")
             
         if cache_type in ["all", "embedding"]:
@@ -210,55 +708,38 @@ class LLMHandler:
             if self.documents_cache_file.exists():
                 self.documents_cache_file.unlink()
                 logging.info("Documents cache cleared.")
+            if self.index_manifest_file.exists():
+                self.index_manifest_file.unlink()
+            self.index_manifest = {}
             
         if cache_type == "all":
             logging.info("All caches cleared.")
             
-    def reload_notion_pages(self):
-        logging.info("Forcing reload of Notion pages...")
-        self._initialize_index()
+    def sync_notion_pages(self) -> Dict[str, List[str]]:
+        hashes = dict(self.index_manifest.get("documents") or self._document_hashes(self.documents))
+        last_edited = dict(self.index_manifest.get("last_edited", {}))
+        
+        result = self._get_notion_sync().sync(self.index, self._notion_page_ids(), last_edited, hashes)
+        
+        documents = {self._document_key(doc): doc for doc in self.documents}
+        for page_id in result["removed"]:
+            documents.pop(page_id, None)
+        for doc in result["documents"]:
+            documents[self._document_key(doc)] = doc
+        self.documents = list(documents.values())
+        
+        self._save_index_manifest(last_edited)
         self._save_embedding_cache()
         self._save_documents_cache()
-        logging.info("Notion pages reloaded successfully.")
-
-
-class RetryNotionReader:
-    def __init__(self, reader: NotionPageReader, max_retries: int = 5, retry_delay: int = 3):
-        self.reader = reader
-        self.max_retries = max_retries
-        self.retry_delay = retry_delay
-        
-    def load_data(self, page_ids: List[str], **kwargs) -> List[Any]:
-        all_documents = []
-        
-        for page_id in page_ids:
-            for attempt in range(self.max_retries):
-                try:
-                    logging.info(f"Loading Notion page {page_id} (attempt {attempt+1}/{self.max_retries})")
-                    documents = self.reader.load_data(page_ids=[page_id], **kwargs)
-                    all_documents.extend(documents)
-                    break  # Success, exit the retry loop
-                except (RequestException, ProxyError, ConnectionError) as e:
-                    logging.warning(f"Error loading Notion page {page_id} (attempt {attempt+1}/{self.max_retries}): {e}")
-                    if attempt < self.max_retries - 1:
-                        logging.info(f"Retrying in {self.retry_delay} seconds...")
-                        time.sleep(self.retry_delay)
-                    else:
-                        logging.error(f"Failed to load Notion page {page_id} after {self.max_retries} attempts.")
-                        # Create a placeholder document with an error message
-                        error_doc = Document(
-                            text=f"Error loading Notion page {page_id}: {str(e)}",
-                            metadata={"page_id": page_id, "error": str(e)}
-                        )
-                        all_documents.append(error_doc)
-                except Exception as e:
-                    logging.error(f"Unexpected error loading Notion page {page_id}: {e}")
-                    # Create a placeholder document with an error message
-                    error_doc = Document(
-                        text=f"Error loading Notion page {page_id}: {str(e)}",
-                        metadata={"page_id": page_id, "error": str(e)}
-                    )
-                    all_documents.append(error_doc)
-                    break  # Don't retry for unexpected errors
+        return result
         
-        return all_documents
\ No newline at end of file
+    def reload_notion_pages(self, full: bool = False):
+        if full:
+            logging.info("Forcing full reload of Notion pages...")
+            self._initialize_index()
+            self._save_embedding_cache()
+            self._save_documents_cache()
+        else:
+            logging.info("Syncing changed Notion pages...")
+            self.sync_notion_pages()
+        logging.info("Notion pages reloaded successfully.")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hashlib
+import json
+import threading
+import time
+
+# Vocabulary for the generated answers; the prompt's hash picks the words, so equal prompts get equal answers
+WORDS = [
+    "rocky", "team", "page", "notion", "policy", "process", "project", "client", "meeting", "review",
+    "planning", "budget", "report", "level", "growth", "support", "office", "holiday", "training", "data",
+    "the", "a", "for", "with", "and", "is", "are", "our", "every", "each",
+]
+
+
+def standin_answer(prompt, n_tokens):
+    tokens = []
+    digest = b""
+    counter = 0
+    while len(tokens) < n_tokens:
+        if not digest:
+            digest = hashlib.sha256(f"{counter}:{prompt}".encode()).digest()
+            counter += 1
+        tokens.append(WORDS[digest[0] % len(WORDS)])
+        digest = digest[1:]
+    # sentences of twelve words, so streaming clients see sentence boundaries
+    text = []
+    for i, token in enumerate(tokens):
+        text.append(token.capitalize() if i % 12 == 0 else token)
+        if i % 12 == 11 or i == len(tokens) - 1:
+            text[-1] += "."
+    return [f"{token} " if i < len(text) - 1 else token for i, token in enumerate(text)]
+
+
+# OpenAI-compatible stand-in: fixed time to first token, then `tokens_per_second`, deterministic text
+class StandinLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients reuse connections
+    latency = 0.2
+    tokens_per_second = 50.0
+    response_tokens = 64
+    requests_served = 0
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_chunk(self, data):
+        payload = f"data: {data}\n\n".encode()
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send(200, {"object": "list", "data": [{"id": "standin", "object": "model", "owned_by": "rocky"}]})
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        path = self.path.rstrip("/")
+        if path == "/v1/chat/completions":
+            chat = True
+            prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        elif path == "/v1/completions":
+            chat = False
+            prompt = str(body.get("prompt", ""))
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        cls = StandinLLMHandler
+        with cls.lock:
+            cls.requests_served += 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            n_tokens = min(body.get("max_tokens") or cls.response_tokens, cls.response_tokens)
+            tokens = standin_answer(prompt, n_tokens)
+            created = int(time.time())
+            response_id = f"standin-{hashlib.md5(prompt.encode()).hexdigest()[:12]}"
+            model = body.get("model", "standin")
+            time.sleep(cls.latency)
+
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, token in enumerate(tokens):
+                    if i and cls.tokens_per_second:
+                        time.sleep(1.0 / cls.tokens_per_second)
+                    choice = {"index": 0, "finish_reason": None}
+                    if chat:
+                        choice["delta"] = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+                    else:
+                        choice["text"] = token
+                    self._send_chunk(json.dumps({
+                        "id": response_id, "object": "chat.completion.chunk" if chat else "text_completion",
+                        "created": created, "model": model, "choices": [choice],
+                    }))
+                final = {"index": 0, "finish_reason": "stop"}
+                final["delta" if chat else "text"] = {} if chat else ""
+                self._send_chunk(json.dumps({
+                    "id": response_id, "object": "chat.completion.chunk" if chat else "text_completion",
+                    "created": created, "model": model, "choices": [final],
+                }))
+                self._send_chunk("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+                return
+
+            if cls.tokens_per_second:
+                time.sleep(max(len(tokens) - 1, 0) / cls.tokens_per_second)
+            text = "".join(tokens)
+            choice = {"index": 0, "finish_reason": "stop"}
+            if chat:
+                choice["message"] = {"role": "assistant", "content": text}
+            else:
+                choice["text"] = text
+            self._send(200, {
+                "id": response_id, "object": "chat.completion" if chat else "text_completion",
+                "created": created, "model": model, "choices": [choice],
+                "usage": {
+                    "prompt_tokens": len(prompt.split()),
+                    "completion_tokens": len(tokens),
+                    "total_tokens": len(prompt.split()) + len(tokens),
+                },
+            })
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deterministic OpenAI-compatible LLM stand-in for offline latency tests')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8008, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0, help='Generation rate after the first token (0 = instant)')
+    parser.add_argument('--response-tokens', type=int, default=64, help='Tokens per answer (capped by max_tokens)')
+    args = parser.parse_args()
+
+    StandinLLMHandler.latency = args.latency
+    StandinLLMHandler.tokens_per_second = args.tokens_per_second
+    StandinLLMHandler.response_tokens = args.response_tokens
+
+    server = ThreadingHTTPServer((args.host, args.port), StandinLLMHandler)
+    server.daemon_threads = True
+    print(f"LLM stand-in listening on http://{args.host}:{server.server_address[1]}/v1")
+    print(f"  {args.latency:.3f}s to first token, {args.tokens_per_second:g} tokens/s, {args.response_tokens} tokens per answer")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {StandinLLMHandler.requests_served} requests "
+              f"(max {StandinLLMHandler.max_in_flight} concurrent)")
+
+if __name__ == "__main__":
+    main()
@@ -5,35 +5,54 @@ import json
 import os
 from pathlib import Path
 import logging
+import shutil
+from cache_store import CACHE_BACKENDS, find_legacy_cache, open_cache_store
+from embedding_cache import EmbeddingCache
 
 def main():
     parser = argparse.ArgumentParser(description='Manage the LLM cache')
     parser.add_argument('--action', type=str, choices=['clear', 'view', 'stats'], 
                         default='stats', help='Action to perform on the cache')
-    parser.add_argument('--type', type=str, choices=['all', 'response', 'embedding'], 
+    parser.add_argument('--type', type=str, choices=['all', 'response', 'embedding', 'vectors'], 
                         default='all', help='Type of cache to operate on')
     parser.add_argument('--cache-dir', type=str, default='llm_cache', 
                         help='Directory containing the cache files')
+    parser.add_argument('--backend', type=str, choices=list(CACHE_BACKENDS), default='sqlite',
+                        help='Response cache backend')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='Maximum number of response cache entries to view')
     args = parser.parse_args()
     
     logging.basicConfig(level=logging.INFO)
     
     cache_dir = Path(args.cache_dir)
-    response_cache_file = cache_dir / "response_cache.json"
-    embedding_cache_file = cache_dir / "embedding_cache_file.json"
+    response_cache_file = cache_dir / CACHE_BACKENDS[args.backend][1]
+    embedding_cache_file = cache_dir / "embedding_cache.json"
+    vectors_dir = cache_dir / "embeddings"
+    
+    response_cache = None
+    if args.type in ['all', 'response'] and response_cache_file.exists():
+        response_cache = open_cache_store(args.backend, cache_dir)
+    # answers cached before questions were normalized; only an explicit clear removes them
+    legacy_cache_file = find_legacy_cache(cache_dir) if args.backend == 'sqlite' else None
     
     if args.action == 'clear':
-        clear_cache(args.type, response_cache_file, embedding_cache_file)
+        clear_cache(args.type, response_cache, response_cache_file, embedding_cache_file, vectors_dir)
+        if args.type in ['all', 'response'] and legacy_cache_file is not None:
+            legacy_cache_file.unlink()
+            print(f"Legacy response cache removed: {legacy_cache_file}")
     elif args.action == 'view':
-        view_cache(args.type, response_cache_file, embedding_cache_file)
+        view_cache(args.type, response_cache, response_cache_file, embedding_cache_file, args.limit)
     elif args.action == 'stats':
-        show_cache_stats(args.type, response_cache_file, embedding_cache_file)
+        show_cache_stats(args.type, response_cache, response_cache_file, embedding_cache_file, vectors_dir)
+        if args.type in ['all', 'response'] and legacy_cache_file is not None:
+            print(f"Legacy response cache (unused): {legacy_cache_file}, "
+                  f"{os.path.getsize(legacy_cache_file) / 1024:.2f} KB")
 
-def clear_cache(cache_type, response_cache_file, embedding_cache_file):
+def clear_cache(cache_type, response_cache, response_cache_file, embedding_cache_file, vectors_dir):
     if cache_type in ['all', 'response']:
-        if response_cache_file.exists():
-            with open(response_cache_file, 'w') as f:
-                json.dump({}, f)
+        if response_cache is not None:
+            response_cache.clear()
             print(f"Response cache cleared: {response_cache_file}")
         else:
             print(f"Response cache file not found: {response_cache_file}")
@@ -46,17 +65,23 @@ def clear_cache(cache_type, response_cache_file, embedding_cache_file):
         else:
             print(f"Embedding cache file not found: {embedding_cache_file}")
     
+    if cache_type in ['all', 'vectors']:
+        if vectors_dir.exists():
+            shutil.rmtree(vectors_dir)
+            print(f"Vector cache cleared: {vectors_dir}")
+        else:
+            print(f"Vector cache directory not found: {vectors_dir}")
+    
     if cache_type == 'all':
         print("All caches cleared.")
 
-def view_cache(cache_type, response_cache_file, embedding_cache_file):
+def view_cache(cache_type, response_cache, response_cache_file, embedding_cache_file, limit):
     if cache_type in ['all', 'response']:
-        if response_cache_file.exists():
-            with open(response_cache_file, 'r') as f:
-                response_cache = json.load(f)
-            print(f"Response cache ({len(response_cache)} entries):")
-            for i, (key, value) in enumerate(response_cache.items()):
-                print(f"  {i+1}. {key}: {value[:50]}...")
+        if response_cache is not None:
+            print(f"Response cache ({len(response_cache)} entries, most recently used first):")
+            for i, entry in enumerate(response_cache.iter_entries(limit=limit)):
+                label = entry["question"] or entry["key"]
+                print(f"  {i+1}. {label}: {entry['answer'][:50]}...")
         else:
             print(f"Response cache file not found: {response_cache_file}")
     
@@ -70,12 +95,12 @@ def view_cache(cache_type, response_cache_file, embedding_cache_file):
         else:
             print(f"Embedding cache file not found: {embedding_cache_file}")
 
-def show_cache_stats(cache_type, response_cache_file, embedding_cache_file):
+def show_cache_stats(cache_type, response_cache, response_cache_file, embedding_cache_file, vectors_dir):
     if cache_type in ['all', 'response']:
-        if response_cache_file.exists():
-            with open(response_cache_file, 'r') as f:
-                response_cache = json.load(f)
-            print(f"Response cache: {len(response_cache)} entries")
+        if response_cache is not None:
+            stats = response_cache.stats()
+            print(f"Response cache ({stats['backend']}): {stats['entries']} entries")
+            print(f"  Stored text: {stats['bytes'] / 1024:.2f} KB")
             print(f"  File size: {os.path.getsize(response_cache_file) / 1024:.2f} KB")
         else:
             print(f"Response cache file not found: {response_cache_file}")
@@ -88,6 +113,19 @@ def show_cache_stats(cache_type, response_cache_file, embedding_cache_file):
             print(f"  File size: {os.path.getsize(embedding_cache_file) / 1024:.2f} KB")
         else:
             print(f"Embedding cache file not found: {embedding_cache_file}")
+    
+    if cache_type in ['all', 'vectors']:
+        index_files = sorted(vectors_dir.glob("*.db")) if vectors_dir.exists() else []
+        if index_files:
+            for index_file in index_files:
+                # one matrix and index per embedding model, named after the model
+                cache = EmbeddingCache(vectors_dir, index_file.stem)
+                stats = cache.stats()
+                print(f"Vector cache ({stats['model']}): {stats['entries']} vectors of dimension {stats['dim']}")
+                print(f"  Matrix size: {stats['file_bytes'] / 1024:.2f} KB")
+                cache.close()
+        else:
+            print(f"Vector cache directory not found: {vectors_dir}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,46 @@
+import math
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyStats:
+    """
+    Thread-safe latency recorder keeping running totals and a bounded window
+    of recent samples for percentiles.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return 0.0
+        rank = max(0, math.ceil(p / 100 * len(samples)) - 1)
+        return samples[rank]
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Returns count, mean, p50, p95, p99 and max, with latencies in milliseconds.
+        """
+        return {
+            "count": self.count,
+            "mean_ms": (self.total / self.count * 1000) if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
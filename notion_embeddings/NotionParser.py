@@ -1,15 +1,15 @@
-import requests
-
-NOTION_API_KEY = "secret_Xh3OQ4ASf9ZZEXldj0Hxgw8RHXC1MJOwVWz80fO6Xfl"
-headers = {
-    "Authorization": f"Bearer {NOTION_API_KEY}",
-    "Notion-Version": "2022-06-28",  # Latest Notion API version
-    "Content-Type": "application/json"
-}
+from collections import deque
 
 
 class NotionParser:
-    def __init__(self):
+    def __init__(self, client, max_workers: int = 4):
+        """
+        :param client: A ``notion_loader.NotionClient`` (rate-limited, with retries) that every request goes through.
+        :param max_workers: Number of block-children requests issued concurrently.
+        """
+        self.client = client
+        self.max_workers = max_workers
+
         # Dispatch table: maps block types to handler methods
         self.handlers = {
             "bulleted_list_item": self.parse_text,
@@ -20,39 +20,57 @@ class NotionParser:
             "numbered_list_item": self.parse_text,
             "paragraph": self.parse_text,
             "quote": self.parse_text,
-            
+            "to_do": self.parse_text,
+            "toggle": self.parse_text,
+            "code": self.parse_text,
+
             "divider": self.parse_divider,
 
             "table": self.parse_table,
-            
+
             "image": self.parse_image,
-            
+
             "child_page": self.parse_child_page,
 
             "bookmark": self.parse_bookmark,
 
             "column_list": self.parse_column_list,
+            "column": self.parse_column_list,
 
             "child_database": self.parse_child_database
         }
 
+        # Markdown-like prefixes so headings, lists and quotes survive as structure
+        self.prefixes = {
+            "heading_1": "# ",
+            "heading_2": "## ",
+            "heading_3": "### ",
+            "bulleted_list_item": "- ",
+            "numbered_list_item": "1. ",
+            "quote": "> ",
+            "to_do": "[ ] ",
+        }
+
     def parse(self, block):
         """
         Main parser function that dispatches to the correct handler.
 
         :param block: A dictionary representing a Notion block.
+        :return: The block's text, or None when the block carries no text of its own.
         """
         block_type = block.get("type")
-        assert block_type in self.handlers.keys(), f'Parsing of {block_type} not yet implemented'
         handler = self.handlers.get(block_type)
+        if handler is None:
+            return None
         return handler(block, block_type)
 
     def parse_divider(self, block, type=None):
         """Parses a divider."""
         return "---"
-    
+
     def parse_bookmark(self, block,  type="bookmark"):
-        print(block[type]["url"])
+        """Parses a bookmark."""
+        return block[type]["url"]
 
     def parse_image(self, block,  type="image"):
         """Parses an image."""
@@ -63,45 +81,106 @@ class NotionParser:
             return f"![Image]({img['file']['url']})"
 
     def parse_text(self, block, type):
-        """Parses a paragraph."""
+        """Parses any block made of rich text (paragraphs, headings, list items, ...)."""
         rich_text = block[type]['rich_text']
         if rich_text == []:
             return
-        strings = [r["plain_text"] for r in rich_text]
-        if type == 'bulleted_list_item':
-            strings = ["- " + s for s in strings]
-        formatted_string = " ".join(strings)  
-        print(formatted_string) 
-
+        text = "".join(r["plain_text"] for r in rich_text)
+        if type == "to_do" and block[type].get("checked"):
+            return "[x] " + text
+        return self.prefixes.get(type, "") + text
 
     def fetch_page_content(self, id):
-        url = f"https://api.notion.com/v1/blocks/{id}/children"
-        response = requests.get(url, headers=headers)
-        data = response.json()
-        return (data["results"])
+        """
+        Fetches every child block of a page or block, following ``has_more``/``start_cursor``.
+        """
+        return list(self.client.iter_block_children(id))
+
+    def fetch_page_title(self, id):
+        page = self.client.get_page(id)
+        for prop in page.get("properties", {}).values():
+            if prop.get("type") == "title":
+                return "".join(t["plain_text"] for t in prop["title"])
+        return ""
+
+    def fetch_block_tree(self, id):
+        """
+        Fetches the full block tree below ``id`` with the client's shared
+        walker. Child pages are not descended into; they are crawled as pages
+        of their own.
+
+        :return: The top-level blocks, each with its children under ``"children"``.
+        """
+        return self.client.fetch_block_tree(id, self.max_workers, follow_child_pages=False)
+
+    def render(self, blocks):
+        """
+        Renders a block tree to text, indenting nested blocks by their depth.
+        """
+        lines = []
+        stack = [(block, 0) for block in reversed(blocks)]
+        while stack:
+            block, depth = stack.pop()
+            text = self.parse(block)
+            if text:
+                lines.extend("  " * depth + line for line in text.split("\n"))
+            # Table rows are consumed by parse_table; columns add no indentation
+            if block.get("type") == "table":
+                continue
+            child_depth = depth if block.get("type") in ("column_list", "column") else depth + 1
+            stack.extend((child, child_depth) for child in reversed(block.get("children", [])))
+        return "\n".join(lines)
+
+    def crawl(self, page_ids, follow_child_pages: bool = True):
+        """
+        Crawls pages one at a time and yields their structured text, so callers
+        can stream a whole workspace without holding it in memory.
+
+        :param page_ids: The root pages to crawl.
+        :param follow_child_pages: Also crawl sub-pages found in the block trees.
+        :return: A generator of ``{"page_id", "title", "parent_id", "text"}`` dicts.
+        """
+        queue = deque((page_id, None, None) for page_id in page_ids)
+        seen = set()
+        while queue:
+            page_id, title, parent_id = queue.popleft()
+            if page_id in seen:
+                continue
+            seen.add(page_id)
+
+            blocks = self.fetch_block_tree(page_id)
+            if title is None:
+                title = self.fetch_page_title(page_id)
+            if follow_child_pages:
+                pending = list(blocks)
+                while pending:
+                    block = pending.pop()
+                    if block.get("type") == "child_page":
+                        queue.append((block["id"], block["child_page"]["title"], page_id))
+                    else:
+                        pending.extend(block.get("children", []))
+
+            yield {"page_id": page_id, "title": title, "parent_id": parent_id, "text": self.render(blocks)}
 
     def parse_table(self, block,  type=None):
-        table_id = block.get("id")
-        table = self.fetch_page_content("0cfadcad-e646-423f-a4b0-536001a6878a") # get table names automatically ? 
-        rows = [t["table_row"]["cells"] for t in table]
-        table = ""
-        for r in rows:
-            row = []
-            for c in r:
-                row.append(c[0]["plain_text"])
-            row = " | ".join(row)
-            row += "\n"
-            table += row
-        print(table)
-
-    def parse_child_page(self, block,  type=None):
-        print("LOGIC FOR CHILD PAGE; TODO")
-        # recursion to parse child page
-
-    def parse_child_database(self, block,  type=None):
-        print("LOGIC FOR CHILD DATABASE; TODO")
-        # how to integrate context from column names ? 
+        """Parses a table from its already fetched ``table_row`` children."""
+        rows = []
+        for child in block.get("children", []):
+            if child.get("type") != "table_row":
+                continue
+            cells = ["".join(r["plain_text"] for r in cell) for cell in child["table_row"]["cells"]]
+            rows.append("| " + " | ".join(cells) + " |")
+        return "\n".join(rows)
+
+    def parse_child_page(self, block,  type="child_page"):
+        """Parses a child page reference; its content is crawled as a separate page."""
+        return f"[Page: {block[type]['title']}]"
+
+    def parse_child_database(self, block,  type="child_database"):
+        """Parses a child database reference."""
+        # how to integrate context from column names ?
+        return f"[Database: {block[type]['title']}]"
 
     def parse_column_list(self, block,  type="column_list"):
-        print(block[type])
-
+        """Column containers carry no text; their children are rendered in place."""
+        return None
@@ -0,0 +1,297 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+
+from chunking import BLOCK_LINE_TYPES, LINE_TYPES_KEY
+from util import lazy_import
+
+if TYPE_CHECKING:
+    from llama_index.core import Document
+
+llama_core = lazy_import("llama_index.core")
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+
+# Notion allows an average of three requests per second per integration
+NOTION_REQUESTS_PER_SECOND = 3.0
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class NotionAPIError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every worker talking to the Notion API.
+    """
+
+    def __init__(self, rate: float = NOTION_REQUESTS_PER_SECOND, capacity: Optional[float] = None):
+        """
+        :param rate: Tokens added per second, i.e. the sustained request rate.
+        :param capacity: Maximum burst size. Defaults to one second worth of tokens.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        Holds back every caller for ``seconds``, e.g. after a 429 with Retry-After.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated_at = self.paused_until
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class NotionClient:
+    """
+    Minimal Notion REST client with a pooled session, a shared rate limiter and
+    retries using exponential backoff with full jitter.
+    """
+
+    def __init__(self, integration_token: Optional[str], base_url: str = NOTION_API_URL,
+                 rate_limiter: Optional[TokenBucket] = None, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, timeout: float = 30.0,
+                 pool_size: int = 10):
+        """
+        :param integration_token: Notion API key.
+        :param base_url: API root; point it at a local stub server for testing.
+        :param rate_limiter: Limiter shared across threads. Defaults to Notion's request limit.
+        :param max_retries: Attempts per request before giving up.
+        :param backoff_base: First backoff window in seconds, doubled on every retry.
+        :param backoff_max: Upper bound for a single backoff window.
+        :param timeout: Timeout in seconds for each HTTP request.
+        :param pool_size: Number of pooled connections kept open to the API.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {integration_token}",
+            "Notion-Version": NOTION_VERSION,
+        })
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.max_retries):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except RequestException as e:
+                if attempt == self.max_retries - 1:
+                    raise NotionAPIError(f"{method} {path} failed after {self.max_retries} attempts: {e}")
+                delay = self._backoff(attempt)
+                logging.warning(f"{method} {path} failed ({e}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code < 400:
+                try:
+                    return response.json()
+                except ValueError as e:
+                    # e.g. an HTML error page from a proxy; surfaces like any other API error
+                    raise NotionAPIError(f"{method} {path} returned a non-JSON body: {e}",
+                                         status_code=response.status_code)
+
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                raise NotionAPIError(
+                    f"{method} {path} returned {response.status_code}: {response.text[:200]}",
+                    status_code=response.status_code
+                )
+            if attempt == self.max_retries - 1:
+                raise NotionAPIError(
+                    f"{method} {path} still returned {response.status_code} after {self.max_retries} attempts",
+                    status_code=response.status_code
+                )
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                # A 429 applies to the whole integration, so every worker waits it out
+                delay = retry_after + random.uniform(0, self.backoff_base)
+                self.rate_limiter.pause(delay)
+            else:
+                delay = self._backoff(attempt)
+                time.sleep(delay)
+            logging.warning(f"{method} {path} returned {response.status_code}; retrying in {delay:.2f}s")
+
+        raise NotionAPIError(f"{method} {path} was not attempted (max_retries={self.max_retries})")
+
+    def get_page(self, page_id: str) -> Dict[str, Any]:
+        return self.request("GET", f"pages/{page_id}")
+
+    def iter_block_children(self, block_id: str, page_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """
+        Yields every child block of ``block_id``, following ``has_more``/``next_cursor``.
+        """
+        params = {"page_size": page_size}
+        while True:
+            data = self.request("GET", f"blocks/{block_id}/children", params=params)
+            yield from data.get("results", [])
+            if not data.get("has_more") or not data.get("next_cursor"):
+                break
+            params = {"page_size": page_size, "start_cursor": data["next_cursor"]}
+
+    def fetch_block_tree(self, block_id: str, max_workers: int = 4,
+                         follow_child_pages: bool = True) -> List[Dict[str, Any]]:
+        """
+        Fetches every block below ``block_id`` breadth-first, requesting the
+        children of all blocks on a level concurrently. Each block that has
+        children gets them, in order, under ``"children"``.
+
+        :param max_workers: Block-children requests issued at once; the rate limiter still applies.
+        :param follow_child_pages: Descend into child pages; when False they stay references without children.
+        :return: The top-level blocks.
+        """
+        root = {"id": block_id, "children": []}
+        level = [root]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while level:
+                children = executor.map(lambda block: list(self.iter_block_children(block["id"])), level)
+                next_level = []
+                for block, block_children in zip(level, children):
+                    block["children"] = block_children
+                    next_level.extend(
+                        child for child in block_children
+                        if child.get("has_children") and (follow_child_pages or child.get("type") != "child_page")
+                    )
+                level = next_level
+        return root["children"]
+
+
+class ConcurrentNotionReader:
+    """
+    Loads Notion pages with a bounded thread pool over a shared, rate-limited
+    NotionClient; each page's block tree is fetched level by level with
+    NotionClient.fetch_block_tree. The text layout matches llama-index's
+    NotionPageReader so content hashes stay stable when switching between the
+    two readers, except that table rows are included (cells joined by " | "). Each document also
+    records a structure code per line (heading, list item, table row) under
+    ``line_types`` for the structure-aware chunker.
+    """
+
+    def __init__(self, client: NotionClient, max_workers: int = 4):
+        self.client = client
+        self.max_workers = max_workers
+
+    def _render_blocks(self, blocks: List[Dict[str, Any]], num_tabs: int = 0) -> Tuple[str, List[str]]:
+        """
+        Returns the text of a fetched block tree and one structure code per line of it.
+        """
+        result_lines, result_types = [], []
+        for block in blocks:
+            block_obj = block.get(block["type"], {})
+            line_type = BLOCK_LINE_TYPES.get(block["type"], "p")
+            block_lines, block_types = [], []
+            for rich_text in block_obj.get("rich_text", []):
+                if "text" in rich_text:
+                    line = "\t" * num_tabs + rich_text["text"]["content"]
+                    block_lines.append(line)
+                    block_types += [line_type] * (line.count("\n") + 1)
+            if "cells" in block_obj:
+                cells = ["".join(rt["text"]["content"] for rt in cell if "text" in rt) for cell in block_obj["cells"]]
+                line = "\t" * num_tabs + " | ".join(cells)
+                block_lines.append(line)
+                block_types += [line_type] * (line.count("\n") + 1)
+            if block.get("has_children"):
+                child_text, child_types = self._render_blocks(block.get("children", []), num_tabs=num_tabs + 1)
+                block_lines.append(child_text)
+                block_types += child_types
+            result_lines.append("\n".join(block_lines))
+            # a block without text still contributes one empty line
+            result_types += block_types or ["p"]
+        return "\n".join(result_lines), result_types or ["p"]
+
+    def _load_page(self, page_id: str) -> "Document":
+        try:
+            logging.info(f"Loading Notion page {page_id}")
+            # child pages are part of the page's text, as with llama-index's reader
+            text, line_types = self._render_blocks(self.client.fetch_block_tree(page_id, self.max_workers))
+            return llama_core.Document(
+                text=text,
+                id_=page_id,
+                metadata={"page_id": page_id, LINE_TYPES_KEY: ",".join(line_types)},
+                excluded_embed_metadata_keys=[LINE_TYPES_KEY],
+                excluded_llm_metadata_keys=[LINE_TYPES_KEY]
+            )
+        except Exception as e:
+            logging.error(f"Failed to load Notion page {page_id}: {e}")
+            # Create a placeholder document with an error message
+            return llama_core.Document(
+                id_=page_id,
+                text=f"Error loading Notion page {page_id}: {str(e)}",
+                metadata={"page_id": page_id, "error": str(e)}
+            )
+
+    def load_data(self, page_ids: List[str], **kwargs) -> List["Document"]:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._load_page, page_ids))
+
+    def fetch_pages(self, page_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Fetches page objects concurrently. Pages that cannot be fetched map to None.
+        """
+        def fetch(page_id):
+            try:
+                return self.client.get_page(page_id)
+            except NotionAPIError as e:
+                logging.warning(f"Could not fetch metadata for Notion page {page_id}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(page_ids, executor.map(fetch, page_ids)))
@@ -0,0 +1,103 @@
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from notion_loader import ConcurrentNotionReader
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class NotionSync:
+    """
+    Incremental sync between a set of Notion pages and a VectorStoreIndex.
+
+    Per-page state is a pair of dicts keyed by page ID: the Notion
+    ``last_edited_time`` seen at the last sync and the content hash of the
+    document that was embedded. Only pages whose edit time moved (or that
+    are new) are fetched, and only pages whose content hash changed are
+    re-embedded. Pages that are no longer listed have their nodes deleted.
+    """
+
+    def __init__(self, reader: ConcurrentNotionReader):
+        """
+        :param reader: Loader used both for page metadata and for page content.
+        """
+        self.reader = reader
+
+    def fetch_last_edited_times(self, page_ids: List[str]) -> Dict[str, Optional[str]]:
+        """
+        Looks up ``last_edited_time`` for each page. Pages whose metadata cannot
+        be fetched map to None, which makes the sync fall back to comparing hashes.
+        """
+        pages = self.reader.fetch_pages(page_ids)
+        return {page_id: (page or {}).get("last_edited_time") for page_id, page in pages.items()}
+
+    def sync(self, index: Any, page_ids: List[str], last_edited: Dict[str, str],
+             hashes: Dict[str, str]) -> Dict[str, List[str]]:
+        """
+        Brings ``index`` in line with ``page_ids``, updating ``last_edited`` and
+        ``hashes`` in place.
+
+        :param index: The VectorStoreIndex whose nodes are keyed by page ID.
+        :param page_ids: The pages that should be present after the sync.
+        :param last_edited: Page ID -> ``last_edited_time`` recorded at the previous sync.
+        :param hashes: Page ID -> content hash of the currently embedded document.
+        :return: Page IDs grouped as "added", "updated", "removed", "unchanged" and "failed",
+            plus the freshly loaded documents under "documents".
+        """
+        result = {"added": [], "updated": [], "removed": [], "unchanged": [], "failed": [], "documents": []}
+
+        edited_times = self.fetch_last_edited_times(page_ids)
+        stale_ids = [
+            page_id for page_id in page_ids
+            if page_id not in hashes
+            or edited_times[page_id] is None
+            or edited_times[page_id] != last_edited.get(page_id)
+        ]
+        result["unchanged"].extend(page_id for page_id in page_ids if page_id not in stale_ids)
+
+        if stale_ids:
+            logging.info(f"Fetching {len(stale_ids)} changed Notion page(s).")
+            documents = self.reader.load_data(page_ids=stale_ids)
+        else:
+            documents = []
+
+        for doc in documents:
+            page_id = doc.metadata.get("page_id", doc.doc_id)
+            if doc.metadata.get("error"):
+                # Keep whatever was embedded before; the page is retried on the next sync
+                logging.warning(f"Skipping Notion page {page_id} this sync: {doc.metadata['error']}")
+                result["failed"].append(page_id)
+                continue
+
+            new_hash = content_hash(doc.text)
+            if hashes.get(page_id) == new_hash:
+                result["unchanged"].append(page_id)
+            else:
+                if page_id in hashes:
+                    index.delete_ref_doc(page_id, delete_from_docstore=True)
+                    result["updated"].append(page_id)
+                else:
+                    result["added"].append(page_id)
+                doc.id_ = page_id
+                index.insert(doc)
+                hashes[page_id] = new_hash
+                result["documents"].append(doc)
+
+            if edited_times.get(page_id) is not None:
+                last_edited[page_id] = edited_times[page_id]
+
+        for page_id in [page_id for page_id in hashes if page_id not in page_ids]:
+            index.delete_ref_doc(page_id, delete_from_docstore=True)
+            hashes.pop(page_id, None)
+            last_edited.pop(page_id, None)
+            result["removed"].append(page_id)
+
+        logging.info(
+            f"Notion sync: {len(result['added'])} added, {len(result['updated'])} updated, "
+            f"{len(result['removed'])} removed, {len(result['unchanged'])} unchanged, "
+            f"{len(result['failed'])} failed."
+        )
+        return result
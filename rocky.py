@@ -1,68 +1,255 @@
 import os
+import shutil
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Callable, Dict, Optional
 from communication import Communication
 from llm_handler import LLMHandler
+from metrics import LatencyStats
+from util import SentenceChunker
+from watcher import DEFAULT_AUDIO_EXTENSIONS, InputWatcher, ProcessedLedger
 import argparse
 
 class VoiceAssistant:
     # setting up the core components and directory structure for audio processing
-    def __init__(self, whisper_model="tiny"):
-        self.comm = Communication(model_name=whisper_model)
-        self.llm = LLMHandler()
+    def __init__(self, whisper_model="tiny", streaming=False, extensions=DEFAULT_AUDIO_EXTENSIONS,
+                 background_init=False):
+        self.whisper_model = whisper_model
+        self.comm: Optional[Communication] = None
+        self.llm: Optional[LLMHandler] = None
+        self.streaming = streaming
+        self.extensions = extensions
         self.input_dir = Path("input_audio")
         self.output_dir = Path("output_audio")
         os.makedirs(self.input_dir, exist_ok=True)
         os.makedirs(self.output_dir, exist_ok=True)
+        self.ledger_file = self.output_dir / "processed_ledger.db"
+        self.metrics = {
+            "transcription": LatencyStats(),
+            "time_to_first_token": LatencyStats(),
+            "time_to_first_audio": LatencyStats(),
+            "total": LatencyStats(),
+        }
+        
+        self.ready = threading.Event()
+        self.startup_error: Optional[Exception] = None
+        self.startup_timings: Dict[str, float] = {}
+        if background_init:
+            # the caller can start accepting work right away; processing waits on self.ready
+            threading.Thread(target=self._initialize_components, daemon=True).start()
+        else:
+            self._initialize_components()
+            self.wait_until_ready()
+    
+    # loads whisper and the llm handler side by side; they share no state, so startup costs the slower of the two
+    def _initialize_components(self):
+        start = time.perf_counter()
+        
+        def timed(name: str, factory: Callable[[], Any]) -> Any:
+            stage_start = time.perf_counter()
+            component = factory()
+            self.startup_timings[name] = time.perf_counter() - stage_start
+            return component
+        
+        try:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                comm = pool.submit(timed, "communication", lambda: Communication(model_name=self.whisper_model))
+                llm = pool.submit(timed, "llm", LLMHandler)
+                self.comm, self.llm = comm.result(), llm.result()
+            for stage, seconds in self.llm.startup_timings.items():
+                self.startup_timings[f"llm.{stage}"] = seconds
+            self.startup_timings["total"] = time.perf_counter() - start
+            print(f"Voice Assistant ready after {self.startup_timings['total']:.2f}s")
+        except Exception as e:
+            self.startup_error = e
+        finally:
+            self.ready.set()
+    
+    # blocks until the components are loaded; returns False on timeout and re-raises a failed startup
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        if not self.ready.wait(timeout):
+            return False
+        if self.startup_error is not None:
+            raise RuntimeError(f"Voice Assistant failed to start: {self.startup_error}") from self.startup_error
+        return True
+    
+    # stops background work (chat history summaries) on shutdown
+    def close(self):
+        if self.llm is not None:
+            self.llm.close()
+    
+    # readiness flag for health checks: true once every component loaded successfully
+    def is_ready(self) -> bool:
+        return self.ready.is_set() and self.startup_error is None
     
     # handling the language model interaction to generate meaningful responses
     def process_llm_response(self, text: str) -> str:
+        self.wait_until_ready()
         # Use the LLM handler to get a response
         return self.llm.ask_question(text)
     
+    # unique per answer, so concurrent answers within the same second never share (or delete) each other's files
+    def _response_name(self) -> str:
+        return f"response_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    
     # managing the end-to-end flow of audio processing and response generation
-    def process_audio_file(self, audio_file: Path) -> Path:
+    def process_audio_file(self, audio_file: Path) -> Optional[Path]:
+        self.wait_until_ready()
         transcribed_text = self.comm.process_audio_input(audio_file)
         print(f"Transcribed: {transcribed_text}")
+        if not transcribed_text.strip():
+            print("No speech detected, nothing to answer")
+            return None
         
         response_text = self.process_llm_response(transcribed_text)
         print(f"Response: {response_text}")
         
-        output_file = self.output_dir / f"response_{int(time.time())}.mp3"
+        output_file = self.output_dir / f"{self._response_name()}.mp3"
         self.comm.generate_audio_response(response_text, output_file)
         print(f"Audio response saved to: {output_file}")
         
         return output_file
     
+    # streaming variant: llm tokens are chunked into sentences and each sentence is synthesized as soon as it is complete
+    # the per-sentence segment files are deleted once appended to the response, unless keep_segments is set
+    def process_audio_file_streaming(self, audio_file: Path,
+                                     on_segment: Optional[Callable[[Path, str], None]] = None,
+                                     keep_segments: bool = False) -> Dict[str, Any]:
+        self.wait_until_ready()
+        start = time.perf_counter()
+        transcribed_text = self.comm.process_audio_input(audio_file)
+        transcribed_at = time.perf_counter()
+        print(f"Transcribed: {transcribed_text}")
+        if not transcribed_text.strip():
+            print("No speech detected, nothing to answer")
+            return {"transcript": transcribed_text, "response": "", "output_file": None, "segments": [],
+                    "timings": {"transcription": transcribed_at - start}}
+        
+        name = self._response_name()
+        output_file = self.output_dir / f"{name}.mp3"
+        segment_dir = self.output_dir / f"{name}_segments"
+        os.makedirs(segment_dir, exist_ok=True)
+        
+        timings = {"transcription": transcribed_at - start}
+        segments = []
+        
+        # synthesizes one sentence and appends it to the combined response, in submission order
+        def synthesize(index: int, sentence: str) -> Path:
+            segment_file = segment_dir / f"segment_{index:03d}.mp3"
+            self.comm.generate_audio_response(sentence, segment_file)
+            self.comm.append_audio(segment_file, output_file)
+            if index == 0:
+                timings["time_to_first_audio"] = time.perf_counter() - start
+                print(f"First audio after {timings['time_to_first_audio']:.2f}s")
+            if on_segment is not None:
+                on_segment(segment_file, sentence)
+            return segment_file
+        
+        chunker = SentenceChunker()
+        response_tokens = []
+        futures = []
+        try:
+            # a single worker keeps segments in order while the llm keeps streaming
+            with ThreadPoolExecutor(max_workers=1) as tts_worker:
+                for token in self.llm.stream_answer(transcribed_text):
+                    if not response_tokens:
+                        timings["time_to_first_token"] = time.perf_counter() - start
+                    response_tokens.append(token)
+                    for sentence in chunker.feed(token):
+                        futures.append(tts_worker.submit(synthesize, len(futures), sentence))
+                for sentence in chunker.flush():
+                    futures.append(tts_worker.submit(synthesize, len(futures), sentence))
+                segments = [future.result() for future in futures]
+        finally:
+            if not keep_segments:
+                shutil.rmtree(segment_dir, ignore_errors=True)
+        
+        timings["total"] = time.perf_counter() - start
+        for name, seconds in timings.items():
+            self.metrics[name].record(seconds)
+        
+        response_text = "".join(response_tokens)
+        print(f"Response: {response_text}")
+        print(f"Audio response saved to: {output_file} ({len(segments)} segments)")
+        
+        return {
+            "transcript": transcribed_text,
+            "response": response_text,
+            "output_file": output_file,
+            "segments": segments if keep_segments else [],
+            "timings": timings,
+        }
+    
+    # latency summaries for every pipeline stage, in milliseconds, plus the audio seconds skipped by vad
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        metrics = {name: stats.summary() for name, stats in self.metrics.items()}
+        if self.is_ready():
+            metrics["vad"] = self.comm.get_vad_totals()
+        return metrics
+    
     # monitoring the input directory for new audio files and processing them
     def run_interactive(self):
         print("Voice Assistant is running in interactive mode.")
-        print(f"Place audio files in the '{self.input_dir}' directory.")
+        print(f"Place audio files ({', '.join(self.extensions)}) in the '{self.input_dir}' directory.")
         print("Press Ctrl+C to exit.")
         
+        # handles one new file from the watcher's job queue
+        def handle(audio_file: Path) -> Path:
+            print(f"Processing {audio_file}...")
+            if self.streaming:
+                return self.process_audio_file_streaming(audio_file)["output_file"]
+            return self.process_audio_file(audio_file)
+        
+        ledger = ProcessedLedger(self.ledger_file)
+        watcher = InputWatcher(self.input_dir, handle, ledger, extensions=self.extensions)
+        watcher.start()
         try:
+            # the watcher threads do the work; the main thread only waits for ctrl+c
             while True:
-                audio_files = list(self.input_dir.glob("*.mp3"))
-                
-                for audio_file in audio_files:
-                    print(f"Processing {audio_file}...")
-                    self.process_audio_file(audio_file)
-                
-                time.sleep(1)
-                
+                time.sleep(3600)
         except KeyboardInterrupt:
             print("\nVoice Assistant stopped.")
+        finally:
+            watcher.stop()
+            ledger.close()
 
 
 if __name__ == "__main__":
-    assistant = VoiceAssistant()
-    
     parser = argparse.ArgumentParser(description='Voice Assistant CLI')
     parser.add_argument('--audio', type=str, help='Path to audio file to process')
+    parser.add_argument('--stream', action='store_true', help='Stream the answer into sentence-sized audio segments')
+    parser.add_argument('--serve', action='store_true', help='Serve questions and audio uploads over HTTP/WebSocket')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface the server listens on')
+    parser.add_argument('--port', type=int, default=8080, help='Port the server listens on')
+    parser.add_argument('--max-active', type=int, default=2, help='Requests the server processes at once')
+    parser.add_argument('--max-queue', type=int, default=8, help='Requests allowed to wait before new ones get 429')
+    parser.add_argument('--extensions', type=str, default=",".join(DEFAULT_AUDIO_EXTENSIONS),
+                        help='Comma-separated audio file extensions picked up in interactive mode')
     args = parser.parse_args()
     
+    extensions = tuple(e.strip() for e in args.extensions.split(",") if e.strip())
     audio_file = Path(args.audio) if args.audio else None
-    if audio_file and audio_file.exists():
-        assistant.process_audio_file(audio_file)
-    else:
-        print(f"Audio file not found: {audio_file}")
\ No newline at end of file
+    # interactive and server modes start right away and hold work until the models are loaded
+    assistant = VoiceAssistant(streaming=args.stream, extensions=extensions, background_init=audio_file is None)
+    for stage, seconds in assistant.startup_timings.items():
+        print(f"Startup {stage}: {seconds:.2f}s")
+    
+    try:
+        if args.serve:
+            from server import VoiceServer
+            VoiceServer(assistant, max_active=args.max_active, max_queue=args.max_queue).serve(args.host, args.port)
+        elif audio_file is None:
+            assistant.run_interactive()
+        elif audio_file.exists():
+            if args.stream:
+                result = assistant.process_audio_file_streaming(audio_file)
+                print(f"Time to first audio: {result['timings'].get('time_to_first_audio', 0):.2f}s")
+            else:
+                assistant.process_audio_file(audio_file)
+        else:
+            print(f"Audio file not found: {audio_file}")
+    finally:
+        assistant.close()
\ No newline at end of file
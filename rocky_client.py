@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+from pathlib import Path
+import argparse
+import asyncio
+import base64
+import json
+import time
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError, HTTPRequest
+from tornado.websocket import websocket_connect
+
+AUDIO_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav", ".m4a": "audio/mp4"}
+
+def request_payload(args):
+    # (body, content type): a json question or the raw bytes of an audio clip
+    if args.audio:
+        path = Path(args.audio)
+        return path.read_bytes(), AUDIO_TYPES.get(path.suffix.lower(), "application/octet-stream")
+    return json.dumps({"question": args.question, "speak": not args.no_audio}).encode(), "application/json"
+
+def handle_event(event, result, client_id, save_dir, verbose):
+    now = time.perf_counter()
+    kind = event["event"]
+    if kind == "token":
+        result.setdefault("first_token", now - result["start"])
+        if verbose:
+            print(event["text"], end="", flush=True)
+    elif kind == "transcript":
+        print(f"[{client_id}] Transcript: {event['text']}")
+    elif kind == "audio":
+        result.setdefault("first_audio", now - result["start"])
+        result["segments"] = result.get("segments", 0) + 1
+        if save_dir is not None:
+            segment = save_dir / f"client_{client_id}_segment_{event['index']:03d}.{event['format']}"
+            segment.write_bytes(base64.b64decode(event["data"]))
+    elif kind == "done":
+        result["response"] = event["response"]
+        result["server_timings"] = event["timings"]
+    elif kind == "error":
+        result["status"] = event.get("status", 500)
+        result["error"] = event.get("message")
+        if "retry_after" in event:
+            result["retry_after"] = str(event["retry_after"])
+
+async def ask_http(args, client_id, save_dir):
+    body, content_type = request_payload(args)
+    result = {"start": time.perf_counter(), "status": 200}
+    buffer = b""
+
+    # the answer arrives as newline-delimited json events, split across arbitrary chunks
+    def on_chunk(chunk):
+        nonlocal buffer
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                handle_event(json.loads(line), result, client_id, save_dir, args.verbose)
+
+    request = HTTPRequest(f"{args.url}/ask", method="POST", body=body, headers={"Content-Type": content_type},
+                          streaming_callback=on_chunk, request_timeout=args.timeout)
+    try:
+        await AsyncHTTPClient().fetch(request)
+    except HTTPClientError as e:
+        result["status"] = e.code
+        result["error"] = e.message
+        if e.response is not None and e.response.headers.get("Retry-After"):
+            result["retry_after"] = e.response.headers["Retry-After"]
+    result["total"] = time.perf_counter() - result["start"]
+    return result
+
+async def ask_websocket(args, client_id, save_dir):
+    body, content_type = request_payload(args)
+    result = {"start": time.perf_counter(), "status": 200}
+    connection = await websocket_connect(args.url.replace("http", "ws", 1) + "/ws")
+    try:
+        await connection.write_message(body.decode() if content_type == "application/json" else body,
+                                       binary=content_type != "application/json")
+        while True:
+            message = await connection.read_message()
+            if message is None:
+                result.update(status=599, error="connection closed")
+                break
+            event = json.loads(message)
+            handle_event(event, result, client_id, save_dir, args.verbose)
+            if event["event"] in ("done", "error"):
+                break
+    finally:
+        connection.close()
+    result["total"] = time.perf_counter() - result["start"]
+    return result
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(0, -(-len(values) * p // 100) - 1)] if values else 0.0
+
+async def main():
+    parser = argparse.ArgumentParser(description='Send questions or audio clips to a running Voice Assistant server')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8080', help='Server root URL')
+    parser.add_argument('--question', type=str, default='What is the holiday policy?', help='Question to ask')
+    parser.add_argument('--audio', type=str, default=None, help='Audio clip to upload instead of a question')
+    parser.add_argument('--ws', action='store_true', help='Use the WebSocket endpoint instead of HTTP')
+    parser.add_argument('--concurrency', type=int, default=1, help='Clients sending the request at once')
+    parser.add_argument('--no-audio', action='store_true', help='Skip speech synthesis (text questions only)')
+    parser.add_argument('--save-audio', type=str, default=None, help='Directory to save received audio segments')
+    parser.add_argument('--timeout', type=float, default=300.0, help='Seconds to wait for a full answer')
+    args = parser.parse_args()
+    args.verbose = args.concurrency == 1
+
+    save_dir = Path(args.save_audio) if args.save_audio else None
+    if save_dir is not None:
+        save_dir.mkdir(parents=True, exist_ok=True)
+    AsyncHTTPClient.configure(None, max_clients=max(10, args.concurrency))
+
+    ask = ask_websocket if args.ws else ask_http
+    start = time.perf_counter()
+    results = await asyncio.gather(*(ask(args, i, save_dir) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    if args.verbose:
+        print()
+
+    answered = [r for r in results if r["status"] == 200]
+    shed = [r for r in results if r["status"] == 429]
+    print(f"{len(results)} requests in {elapsed:.2f}s: {len(answered)} answered, {len(shed)} shed (429), "
+          f"{len(results) - len(answered) - len(shed)} failed")
+    for r in results:
+        if r["status"] not in (200, 429):
+            print(f"  error {r['status']}: {r.get('error')}")
+    for name in ("first_token", "first_audio", "total"):
+        values = [r[name] for r in answered if name in r]
+        if values:
+            print(f"  {name}: p50 {percentile(values, 50):.2f}s, p95 {percentile(values, 95):.2f}s, "
+                  f"max {max(values):.2f}s")
+    if shed:
+        print(f"  Retry-After on shed requests: {sorted({r.get('retry_after', '?') for r in shed})}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
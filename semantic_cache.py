@@ -0,0 +1,130 @@
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import LatencyStats
+
+# Disfluencies Whisper keeps in transcripts that never change what is being asked
+FILLER_WORDS = {"um", "umm", "uh", "uhh", "uhm", "er", "erm", "ah", "eh", "hmm", "mm", "mhm"}
+FILLER_PHRASES = ["you know", "i mean", "like i said", "kind of", "sort of"]
+
+
+def normalize_question(question: str) -> str:
+    """
+    Lower-cases a question and strips punctuation and filler words, so that
+    transcripts of the same spoken question map to the same text.
+    """
+    text = question.lower()
+    text = re.sub(r"[^\w\s']", " ", text)
+    for phrase in FILLER_PHRASES:
+        text = re.sub(rf"\b{phrase}\b", " ", text)
+    words = [w.strip("'") for w in text.split()]
+    return " ".join(w for w in words if w and w not in FILLER_WORDS)
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour index over the embeddings of answered questions. It maps
+    a new question to the cache key of a previously answered one when their
+    cosine similarity reaches ``threshold``. The answers and their embeddings
+    are persisted by the response cache store; this class only keeps the
+    in-memory matrix used for the search.
+    """
+
+    def __init__(self, embedding_function: Callable[[List[str]], Any], threshold: float = 0.92):
+        """
+        :param embedding_function: Chroma-style embedding function (list of texts -> list of vectors).
+        :param threshold: Minimum cosine similarity for a question to count as a hit.
+        """
+        self.embedding_function = embedding_function
+        self.threshold = threshold
+        self.keys: List[str] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.lookup_latency = LatencyStats()
+
+    def load(self, entries: Iterable[Tuple[str, np.ndarray]]):
+        """
+        Replaces the index with ``(cache_key, embedding)`` pairs, e.g. from CacheStore.iter_embeddings().
+        """
+        entries = list(entries)
+        with self.lock:
+            self.keys = [key for key, _ in entries]
+            self.vectors = np.vstack([vector for _, vector in entries]).astype(np.float32) if entries else None
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embedding_function([text])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, question: str, vector: Optional[np.ndarray] = None) -> Optional[Tuple[str, float]]:
+        """
+        Returns ``(cache_key, similarity)`` of the closest answered question, or
+        None when nothing is similar enough.
+
+        :param question: The normalized question.
+        :param vector: Its embedding, if the caller already computed it.
+        """
+        start = time.perf_counter()
+        try:
+            if vector is None:
+                vector = self.embed(question)
+            with self.lock:
+                if self.vectors is None or not self.keys:
+                    match = None
+                else:
+                    scores = self.vectors @ vector
+                    best = int(np.argmax(scores))
+                    match = (self.keys[best], float(scores[best]))
+                hit = match is not None and match[1] >= self.threshold
+                # lookups run on worker threads, so the counters move under the lock too
+                if hit:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            return match if hit else None
+        finally:
+            self.lookup_latency.record(time.perf_counter() - start)
+
+    def add(self, key: str, vector: np.ndarray):
+        with self.lock:
+            if key in self.keys:
+                self.vectors[self.keys.index(key)] = vector
+            elif self.vectors is None:
+                self.keys = [key]
+                self.vectors = vector[np.newaxis, :]
+            else:
+                self.keys.append(key)
+                self.vectors = np.vstack([self.vectors, vector])
+
+    def remove(self, keys: Iterable[str]):
+        keys = set(keys)
+        with self.lock:
+            keep = [i for i, key in enumerate(self.keys) if key not in keys]
+            if len(keep) == len(self.keys):
+                return
+            self.keys = [self.keys[i] for i in keep]
+            self.vectors = self.vectors[keep] if keep else None
+
+    def clear(self):
+        with self.lock:
+            self.keys, self.vectors = [], None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries, hits, misses = len(self.keys), self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "threshold": self.threshold,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "lookup_latency": self.lookup_latency.summary(),
+        }
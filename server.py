@@ -0,0 +1,354 @@
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional
+
+import tornado.httpserver
+import tornado.iostream
+import tornado.web
+import tornado.websocket
+
+from metrics import LatencyStats
+from util import SentenceChunker
+
+if TYPE_CHECKING:
+    from rocky import VoiceAssistant
+
+# one event of a streamed answer: transcript, token, audio, done or error
+Event = Dict[str, Any]
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; the reason is 'queue_full' or 'queue_timeout'."""
+
+
+class AdmissionController:
+    """
+    Caps the pipelines running at once and the requests waiting for one.
+    Requests beyond both limits, or waiting longer than ``queue_timeout``,
+    are shed so that queued work never exceeds what the models can finish
+    in time. Only touched from the event loop, so plain counters suffice.
+    """
+
+    def __init__(self, max_active: int = 2, max_queue: int = 8, queue_timeout: float = 30.0):
+        """
+        :param max_active: Requests processed concurrently.
+        :param max_queue: Requests allowed to wait for a slot; 0 sheds everything beyond max_active.
+        :param queue_timeout: Seconds a request may wait for a slot before it is shed.
+        """
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "queue_timeout": 0}
+        self.queue_wait = LatencyStats()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self):
+        if self.active + self.queued >= self.max_active + self.max_queue:
+            self.shed["queue_full"] += 1
+            raise Overloaded("queue_full")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_active)
+        start = time.perf_counter()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed["queue_timeout"] += 1
+            raise Overloaded("queue_timeout")
+        finally:
+            self.queued -= 1
+        self.active += 1
+        self.admitted += 1
+        self.queue_wait.record(time.perf_counter() - start)
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    # seconds a shed client should wait before retrying: roughly one queue's worth of work
+    def retry_after(self) -> int:
+        return max(1, round(self.queue_wait.percentile(95) + 1))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_active": self.max_active,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "queue_wait": self.queue_wait.summary(),
+        }
+
+
+class VoiceServer:
+    """
+    Serves one VoiceAssistant over HTTP and WebSocket. Every request shares
+    the assistant's Whisper model, LLMHandler and TTS backend; the model
+    stages run on dedicated thread pools (a single one for Whisper, which is
+    not safe to call concurrently) while the answer streams from the LLM on
+    the event loop, so a request's events go out as soon as each stage
+    produces them.
+    """
+
+    def __init__(self, assistant: "VoiceAssistant", max_active: int = 2, max_queue: int = 8,
+                 queue_timeout: float = 30.0, tts_workers: int = 2, max_upload_bytes: int = 25 * 1024 * 1024):
+        """
+        :param assistant: The assistant whose components answer every request.
+        :param max_active: Requests processed concurrently.
+        :param max_queue: Requests allowed to wait for a slot before new ones get 429.
+        :param queue_timeout: Seconds a request may wait for a slot before it gets 429.
+        :param tts_workers: Threads synthesizing answer sentences across all requests.
+        :param max_upload_bytes: Largest accepted audio upload.
+        """
+        self.assistant = assistant
+        self.admission = AdmissionController(max_active, max_queue, queue_timeout)
+        self.max_upload_bytes = max_upload_bytes
+        self.asr_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr")
+        self.tts_pool = ThreadPoolExecutor(max_workers=tts_workers, thread_name_prefix="tts")
+        self.temp_dir = Path(tempfile.mkdtemp(prefix="rocky_server_"))
+        self.audio_format = "mp3"
+        self.requests = 0
+
+    # synthesizes one sentence to a scratch file and returns its bytes; the audio cache still applies
+    def _synthesize(self, sentence: str, name: str) -> bytes:
+        path = self.temp_dir / f"{name}.{self.audio_format}"
+        try:
+            self.assistant.comm.generate_audio_response(sentence, path)
+            return path.read_bytes()
+        finally:
+            if os.path.lexists(path):
+                path.unlink()
+
+    # runs one request end to end, handing each event to `send` as soon as it is ready
+    async def answer(self, send: Callable[[Event], Awaitable[None]], question: Optional[str] = None,
+                     audio: Optional[bytes] = None, speak: bool = True) -> Event:
+        loop = asyncio.get_running_loop()
+        self.requests += 1
+        request_id = f"{os.getpid()}_{self.requests}"
+        metrics = self.assistant.metrics
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+
+        if audio is not None:
+            question = await loop.run_in_executor(self.asr_pool, self.assistant.comm.process_audio_input_bytes, audio)
+            question = question.strip()
+            timings["transcription"] = time.perf_counter() - start
+            await send({"event": "transcript", "text": question})
+            if not question:
+                done = {"event": "done", "response": "", "timings": timings}
+                await send(done)
+                return done
+
+        sentences: asyncio.Queue = asyncio.Queue()
+
+        # synthesizes sentences in answer order while the llm keeps streaming
+        async def speaker():
+            index = 0
+            while (sentence := await sentences.get()) is not None:
+                data = await loop.run_in_executor(self.tts_pool, self._synthesize, sentence, f"{request_id}_{index}")
+                if index == 0:
+                    timings["time_to_first_audio"] = time.perf_counter() - start
+                await send({
+                    "event": "audio", "index": index, "text": sentence, "format": self.audio_format,
+                    "data": base64.b64encode(data).decode("ascii"),
+                })
+                index += 1
+
+        speaker_task = asyncio.ensure_future(speaker()) if speak else None
+        try:
+            chunker = SentenceChunker()
+            tokens = []
+            async for token in self.assistant.llm.astream_answer(question):
+                if not tokens:
+                    timings["time_to_first_token"] = time.perf_counter() - start
+                tokens.append(token)
+                await send({"event": "token", "text": token})
+                if speaker_task is not None:
+                    for sentence in chunker.feed(token):
+                        sentences.put_nowait(sentence)
+            if speaker_task is not None:
+                for sentence in chunker.flush():
+                    sentences.put_nowait(sentence)
+                sentences.put_nowait(None)
+                await speaker_task
+        finally:
+            if speaker_task is not None and not speaker_task.done():
+                speaker_task.cancel()
+
+        timings["total"] = time.perf_counter() - start
+        for name, seconds in timings.items():
+            metrics[name].record(seconds)
+        done = {"event": "done", "response": "".join(tokens), "timings": timings}
+        await send(done)
+        return done
+
+    # admission-controlled answer; raises Overloaded when the request is shed
+    async def handle(self, send: Callable[[Event], Awaitable[None]], **request) -> Event:
+        await self.admission.acquire()
+        try:
+            return await self.answer(send, **request)
+        finally:
+            self.admission.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.assistant.is_ready(),
+            "requests": self.requests,
+            "admission": self.admission.stats(),
+        }
+
+    def make_app(self) -> tornado.web.Application:
+        return tornado.web.Application([
+            (r"/ask", AskHandler, {"server": self}),
+            (r"/ws", AskWebSocket, {"server": self}),
+            (r"/health", HealthHandler, {"server": self}),
+            (r"/metrics", MetricsHandler, {"server": self}),
+        ])
+
+    # blocks serving requests until ctrl+c
+    def serve(self, host: str = "127.0.0.1", port: int = 8080):
+        async def run():
+            http_server = tornado.httpserver.HTTPServer(self.make_app(), max_body_size=self.max_upload_bytes)
+            http_server.listen(port, address=host)
+            print(f"Voice Assistant serving on http://{host}:{port} "
+                  f"({self.admission.max_active} active, {self.admission.max_queue} queued)")
+            await asyncio.Event().wait()
+
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            print("\nVoice Assistant server stopped.")
+        finally:
+            self.asr_pool.shutdown(wait=False)
+            self.tts_pool.shutdown(wait=False)
+            self.assistant.close()
+
+
+def parse_request(body: bytes, content_type: str) -> Dict[str, Any]:
+    """
+    JSON bodies carry ``{"question": ..., "speak": true}``; anything else is an audio upload.
+    """
+    if content_type.split(";")[0].strip() == "application/json":
+        payload = json.loads(body or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object")
+        question = str(payload.get("question", "")).strip()
+        if not question:
+            raise ValueError("Missing 'question'")
+        return {"question": question, "speak": bool(payload.get("speak", True))}
+    if not body:
+        raise ValueError("Empty audio upload")
+    return {"audio": body}
+
+
+class ServerHandler(tornado.web.RequestHandler):
+    def initialize(self, server: VoiceServer):
+        self.server = server
+
+    def write_json(self, status: int, body: Dict[str, Any]):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(body))
+
+    # 503 while the models load; the client should retry shortly
+    def reject_until_ready(self) -> bool:
+        if self.server.assistant.is_ready():
+            return False
+        self.set_header("Retry-After", "5")
+        self.write_json(503, {"error": "loading", "startup_error": str(self.server.assistant.startup_error or "")})
+        return True
+
+
+# POST /ask: a json question or an audio upload; the answer streams back as newline-delimited json events
+class AskHandler(ServerHandler):
+    async def post(self):
+        if self.reject_until_ready():
+            return
+        try:
+            request = parse_request(self.request.body, self.request.headers.get("Content-Type", ""))
+            if "speak" not in request:
+                request["speak"] = self.get_argument("speak", "1") != "0"
+        except ValueError as e:
+            self.write_json(400, {"error": str(e)})
+            return
+
+        streaming = False
+
+        async def send(event: Event):
+            nonlocal streaming
+            if not streaming:
+                streaming = True
+                self.set_header("Content-Type", "application/x-ndjson")
+            self.write(json.dumps(event) + "\n")
+            await self.flush()
+
+        try:
+            await self.server.handle(send, **request)
+        except Overloaded as e:
+            self.set_header("Retry-After", str(self.server.admission.retry_after()))
+            self.write_json(429, {"error": "overloaded", "reason": str(e)})
+            return
+        except tornado.iostream.StreamClosedError:
+            return  # the client went away mid-answer
+        except Exception as e:
+            if streaming:
+                await send({"event": "error", "message": str(e)})
+            else:
+                self.write_json(500, {"error": str(e)})
+                return
+        self.finish()
+
+
+# /ws: each text (json question) or binary (audio) message is one request; events come back as json messages
+class AskWebSocket(tornado.websocket.WebSocketHandler):
+    def initialize(self, server: VoiceServer):
+        self.server = server
+
+    # returning a coroutine makes tornado deliver the next message only after this one is answered
+    async def on_message(self, message):
+        async def send(event: Event):
+            await self.write_message(json.dumps(event))
+
+        if not self.server.assistant.is_ready():
+            await send({"event": "error", "status": 503, "message": "loading"})
+            return
+        try:
+            if isinstance(message, bytes):
+                request = parse_request(message, "audio/*")
+            else:
+                request = parse_request(message.encode(), "application/json")
+        except ValueError as e:
+            await send({"event": "error", "status": 400, "message": str(e)})
+            return
+
+        try:
+            await self.server.handle(send, **request)
+        except Overloaded as e:
+            await send({"event": "error", "status": 429, "message": "overloaded", "reason": str(e),
+                        "retry_after": self.server.admission.retry_after()})
+        except tornado.websocket.WebSocketClosedError:
+            pass
+        except Exception as e:
+            await send({"event": "error", "status": 500, "message": str(e)})
+
+
+# GET /health: 200 once the models are loaded, 503 before, with the current load
+class HealthHandler(ServerHandler):
+    def get(self):
+        self.write_json(200 if self.server.assistant.is_ready() else 503, self.server.stats())
+
+
+# GET /metrics: pipeline latency summaries plus admission counters
+class MetricsHandler(ServerHandler):
+    def get(self):
+        self.write_json(200, {**self.server.stats(), "pipeline": self.server.assistant.get_metrics()})
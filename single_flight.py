@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key share one computation. The
+    first caller to ``join`` a key leads: it computes the result and
+    ``land``s it. Callers joining while it runs follow and receive that
+    result instead of starting their own. A leader that fails or is
+    abandoned lands None, and its followers then compute on their own
+    rather than inherit the failure.
+
+    Flights are plain ``concurrent.futures.Future`` objects, so threads and
+    coroutines on any event loop can share them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights: Dict[str, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """
+        :return: The key's flight and whether the caller leads it.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self.flights[key] = Future()
+            self.leaders += 1
+            return flight, True
+
+    def land(self, key: str, flight: Future, result: Optional[Any]):
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+        flight.set_result(result)
+
+    def _followed(self, result: Optional[Any]) -> Optional[Any]:
+        if result is not None:
+            with self.lock:
+                self.coalesced += 1
+        return result
+
+    def wait(self, flight: Future) -> Optional[Any]:
+        return self._followed(flight.result())
+
+    async def await_flight(self, flight: Future) -> Optional[Any]:
+        # shielded so a cancelled follower cannot cancel the flight the others share
+        return self._followed(await asyncio.shield(asyncio.wrap_future(flight)))
+
+    def run(self, key: str, compute: Callable[[], Any]) -> Any:
+        flight, leader = self.join(key)
+        if not leader:
+            result = self.wait(flight)
+            if result is not None:
+                return result
+            return compute()
+        result = None
+        try:
+            result = compute()
+            return result
+        finally:
+            self.land(key, flight, result)
+
+    async def arun(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        flight, leader = self.join(key)
+        if not leader:
+            result = await self.await_flight(flight)
+            if result is not None:
+                return result
+            return await compute()
+        result = None
+        try:
+            result = await compute()
+            return result
+        finally:
+            self.land(key, flight, result)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"in_flight": len(self.flights), "leaders": self.leaders, "coalesced": self.coalesced}
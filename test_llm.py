@@ -1,29 +1,39 @@
 #!/usr/bin/env python3
 
 from llm_handler import LLMHandler
+from llm_backends import LLM_BACKENDS
 import argparse
 
 def main():
     parser = argparse.ArgumentParser(description='Test the LLM Handler')
     parser.add_argument('--question', type=str, help='Question to ask the LLM')
+    parser.add_argument('--llm-backend', type=str, default='default', choices=list(LLM_BACKENDS),
+                        help='Model that writes the answers')
     args = parser.parse_args()
     
     print("Initializing LLM Handler...")
-    llm = LLMHandler()
+    llm = LLMHandler(llm_backend=args.llm_backend)
+    for stage, seconds in llm.startup_timings.items():
+        print(f"Startup {stage}: {seconds:.2f}s")
     
     if args.question:
         print(f"Question: {args.question}")
         answer = llm.ask_question(args.question)
         print(f"Answer: {answer}")
     else:
-        print("Entering interactive mode. Type 'exit' to quit.")
+        # interactive questions form one conversation, so follow-ups like "and for contractors?" work
+        print("Entering interactive mode. Type 'exit' to quit, 'reset' to start a new conversation.")
         while True:
             question = input("\nEnter your question: ")
             if question.lower() in ['exit', 'quit', 'q']:
                 break
+            if question.lower() == 'reset':
+                llm.clear_chat_history()
+                continue
             
-            answer = llm.ask_question(question)
+            answer = llm.ask_followup(question)
             print(f"\nAnswer: {answer}")
+    llm.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import json
+import random
+import threading
+import time
+
+from notion_loader import ConcurrentNotionReader, NotionClient, TokenBucket
+
+# Stub Notion API: every page has `blocks_per_page` paragraph blocks served in pages of `page_size`
+class StubNotionHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+    throttle_rate = 0.2
+    blocks_per_page = 150
+    missing_pages = set()
+    requests_served = 0
+    throttled = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        cls = StubNotionHandler
+        time.sleep(cls.latency)
+        with cls.lock:
+            cls.requests_served += 1
+            throttle = random.random() < cls.throttle_rate
+            if throttle:
+                cls.throttled += 1
+        if throttle:
+            self._send(429, {"code": "rate_limited"}, {"Retry-After": "1"})
+            return
+
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        page_id = parts[2] if len(parts) > 2 else ""
+        if page_id in cls.missing_pages:
+            self._send(404, {"code": "object_not_found"})
+            return
+
+        if parts[1] == "pages":
+            self._send(200, {"id": page_id, "last_edited_time": "2025-01-01T00:00:00.000Z"})
+            return
+
+        query = parse_qs(url.query)
+        page_size = int(query.get("page_size", ["100"])[0])
+        start = int(query.get("start_cursor", ["0"])[0])
+        end = min(start + page_size, cls.blocks_per_page)
+        results = [
+            {
+                "id": f"{page_id}-{i}",
+                "type": "paragraph",
+                "has_children": False,
+                "paragraph": {"rich_text": [{"text": {"content": f"Block {i} of {page_id}"}}]},
+            }
+            for i in range(start, end)
+        ]
+        has_more = end < cls.blocks_per_page
+        self._send(200, {"results": results, "has_more": has_more, "next_cursor": str(end) if has_more else None})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load pages from a local stub Notion API that injects 429s and latency')
+    parser.add_argument('--pages', type=int, default=20, help='Number of pages to load')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent page loads')
+    parser.add_argument('--rate', type=float, default=20.0, help='Requests per second allowed by the token bucket')
+    parser.add_argument('--latency', type=float, default=0.05, help='Latency injected per stub request in seconds')
+    parser.add_argument('--throttle-rate', type=float, default=0.2, help='Fraction of stub requests answered with 429')
+    parser.add_argument('--missing', type=int, default=1, help='Number of pages that return 404')
+    args = parser.parse_args()
+
+    page_ids = [f"page{i:03d}" for i in range(args.pages)]
+    StubNotionHandler.latency = args.latency
+    StubNotionHandler.throttle_rate = args.throttle_rate
+    StubNotionHandler.missing_pages = set(page_ids[:args.missing])
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubNotionHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    print(f"Stub Notion API listening on {base_url}")
+
+    client = NotionClient("stub-token", base_url=base_url, rate_limiter=TokenBucket(rate=args.rate),
+                          max_retries=8, backoff_base=0.1)
+    reader = ConcurrentNotionReader(client, max_workers=args.workers)
+
+    start = time.perf_counter()
+    documents = reader.load_data(page_ids=page_ids)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    placeholders = [doc for doc in documents if doc.metadata.get("error")]
+    complete = [doc for doc in documents if len(doc.text.splitlines()) == StubNotionHandler.blocks_per_page]
+    print(f"Loaded {len(documents)} documents in {elapsed:.2f}s")
+    print(f"  Complete pages: {len(complete)}")
+    print(f"  Placeholder documents: {len(placeholders)}")
+    print(f"  Stub requests served: {StubNotionHandler.requests_served} ({StubNotionHandler.throttled} throttled)")
+    print(f"  Order preserved: {[doc.doc_id for doc in documents] == page_ids}")
+
+if __name__ == "__main__":
+    main()
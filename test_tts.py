@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 from communication import Communication
+from tts_backends import TTS_BACKENDS
 import argparse
 import os
+import time
 
 def main():
     parser = argparse.ArgumentParser(description='Test the Text-to-Speech functionality')
@@ -10,15 +12,19 @@ def main():
                         help='Text to convert to speech')
     parser.add_argument('--output', type=str, default="test_output.mp3", 
                         help='Output file path')
+    parser.add_argument('--backend', type=str, default="gtts", choices=list(TTS_BACKENDS),
+                        help='Speech synthesis engine')
     args = parser.parse_args()
     
     print("Initializing Communication class...")
-    comm = Communication()
+    comm = Communication(tts_backend=args.backend)
     
     print(f"Converting text to speech: '{args.text}'")
     print(f"Output file: {args.output}")
     
+    start = time.perf_counter()
     comm.generate_audio_response(args.text, args.output)
+    print(f"Synthesis with {args.backend} took {time.perf_counter() - start:.2f}s")
     
     if os.path.exists(args.output):
         file_size = os.path.getsize(args.output)
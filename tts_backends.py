@@ -0,0 +1,106 @@
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, Type, Union
+
+
+class TTSBackend:
+    """
+    Interface for text-to-speech engines used by Communication.
+
+    ``file_format`` is the container the engine writes natively. ``parallel``
+    says how sentences may be synthesized concurrently: "thread", "process"
+    (engines that are not thread-safe) or None. ``remote`` engines get
+    retries with a delay between attempts.
+    """
+
+    name = "base"
+    file_format = "wav"
+    parallel = "thread"
+    remote = False
+
+    def synthesize(self, text: str, output_path: Union[str, Path], lang: str = "en", speed: float = 1.0) -> None:
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS. Needs network access."""
+
+    name = "gtts"
+    file_format = "mp3"
+    parallel = "thread"
+    remote = True
+
+    def synthesize(self, text, output_path, lang="en", speed=1.0):
+        from gtts import gTTS
+        gTTS(text=text, lang=lang, slow=speed < 1.0).save(str(output_path))
+
+
+class Pyttsx3Backend(TTSBackend):
+    """
+    Offline synthesis through pyttsx3 (espeak on Linux, NSSpeechSynthesizer on
+    macOS, SAPI5 on Windows). The engine is not thread-safe, so sentences run
+    in separate processes.
+    """
+
+    name = "pyttsx3"
+    file_format = "wav"
+    parallel = "process"
+    base_rate = 175  # words per minute
+
+    def synthesize(self, text, output_path, lang="en", speed=1.0):
+        import pyttsx3
+        engine = pyttsx3.init()
+        try:
+            engine.setProperty("rate", int(self.base_rate * speed))
+            for voice in engine.getProperty("voices"):
+                languages = [l.decode(errors="ignore") if isinstance(l, bytes) else str(l) for l in voice.languages]
+                if any(lang in l for l in languages) or lang in voice.id:
+                    engine.setProperty("voice", voice.id)
+                    break
+            engine.save_to_file(text, str(output_path))
+            engine.runAndWait()
+        finally:
+            engine.stop()
+
+
+class EspeakBackend(TTSBackend):
+    """
+    Offline synthesis by invoking the espeak-ng (or espeak) binary. Every call
+    is its own subprocess, so sentences can be synthesized from threads.
+    """
+
+    name = "espeak"
+    file_format = "wav"
+    parallel = "thread"
+    base_rate = 175  # words per minute
+
+    def __init__(self):
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+        if self.binary is None:
+            raise RuntimeError("Neither espeak-ng nor espeak is installed")
+
+    def synthesize(self, text, output_path, lang="en", speed=1.0):
+        subprocess.run(
+            [self.binary, "-v", lang, "-s", str(int(self.base_rate * speed)), "-w", str(output_path), text],
+            check=True, capture_output=True
+        )
+
+
+TTS_BACKENDS: Dict[str, Type[TTSBackend]] = {
+    GTTSBackend.name: GTTSBackend,
+    Pyttsx3Backend.name: Pyttsx3Backend,
+    EspeakBackend.name: EspeakBackend,
+}
+
+
+def create_tts_backend(name: str) -> TTSBackend:
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name}. Choose from {list(TTS_BACKENDS)}")
+    return TTS_BACKENDS[name]()
+
+
+# module level so process pools can pickle it
+def synthesize_segment(backend: TTSBackend, text: str, output_path: str, lang: str, speed: float) -> str:
+    backend.synthesize(text, output_path, lang=lang, speed=speed)
+    return output_path
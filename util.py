@@ -1,7 +1,10 @@
 import csv
+import importlib
 import re
+import threading
+from typing import Any, List
 
-def extract_notion_ids():
+def extract_notion_ids(verbose: bool = False):
     notion_ids = []
     
     with open('pages.csv', 'r') as file:
@@ -10,7 +13,78 @@ def extract_notion_ids():
             match = re.search(r'([a-f0-9]{32})\?pvs=4', row['url'])
             if match:
                 notion_ids.append(match.group(1))
-                print(row['title'])
+                if verbose:
+                    print(row['title'])
     return notion_ids
 
-ids = extract_notion_ids()
+# sentence end: terminal punctuation (optionally closed by a quote or bracket) followed by whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+ABBREVIATIONS = {"e.g.", "i.e.", "etc.", "vs.", "mr.", "mrs.", "ms.", "dr.", "approx."}
+
+def sentence_boundaries(text: str) -> List[int]:
+    boundaries = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        words = text[start:match.end()].split()
+        if words and words[-1].lower() in ABBREVIATIONS:
+            continue
+        boundaries.append(match.end())
+        start = match.end()
+    return boundaries
+
+def split_sentences(text: str) -> List[str]:
+    starts = [0] + sentence_boundaries(text)
+    ends = starts[1:] + [len(text)]
+    return [text[a:b].strip() for a, b in zip(starts, ends) if text[a:b].strip()]
+
+# buffers streamed LLM tokens and releases complete sentences, merging ones shorter than min_chars
+class SentenceChunker:
+    def __init__(self, min_chars: int = 20):
+        self.min_chars = min_chars
+        self.buffer = ""
+    
+    def feed(self, token: str) -> List[str]:
+        self.buffer += token
+        boundaries = sentence_boundaries(self.buffer)
+        if not boundaries:
+            return []
+        
+        complete, pending = self.buffer[:boundaries[-1]], self.buffer[boundaries[-1]:]
+        ready = []
+        current = ""
+        for sentence in split_sentences(complete):
+            current = f"{current} {sentence}".strip()
+            if len(current) >= self.min_chars:
+                ready.append(current)
+                current = ""
+        self.buffer = f"{current} {pending}" if current else pending
+        return ready
+    
+    def flush(self) -> List[str]:
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
+
+# stands in for a heavy module (torch, whisper, chromadb, llama_index) and imports it on first attribute access
+class LazyModule:
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+    
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+    
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,121 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Sample range [start, end) of a speech region
+Segment = Tuple[int, int]
+
+
+class EnergyVAD:
+    """
+    Frame-energy voice activity detector for 16 kHz mono float32 audio (the
+    format whisper.load_audio returns). A frame counts as speech when its RMS
+    level is ``noise_margin_db`` above the clip's noise floor and above the
+    absolute ``threshold_db``. Short pauses inside speech are bridged, short
+    blips are dropped, and regions are padded so word onsets survive.
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 30, threshold_db: float = -60.0,
+                 noise_margin_db: float = 10.0, min_speech_ms: int = 250, min_silence_ms: int = 500,
+                 padding_ms: int = 200, max_segment_s: float = 30.0):
+        """
+        :param sample_rate: Sample rate of the audio passed in.
+        :param frame_ms: Analysis frame length.
+        :param threshold_db: Absolute level (dBFS) below which a frame is always silence. Kept low so
+            quiet but clean recordings are judged by the noise floor alone.
+        :param noise_margin_db: How far above the noise floor (10th percentile frame level) speech must be.
+        :param min_speech_ms: Speech regions shorter than this are discarded as clicks or breaths.
+        :param min_silence_ms: Pauses shorter than this do not split a region.
+        :param padding_ms: Audio kept on both sides of each region.
+        :param max_segment_s: Longer regions are split at their quietest frame (Whisper's window is 30 s).
+        """
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.threshold_db = threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.min_silence_frames = max(1, min_silence_ms // frame_ms)
+        self.padding = int(sample_rate * padding_ms / 1000)
+        self.max_segment = int(sample_rate * max_segment_s)
+
+    def frame_levels(self, audio: np.ndarray) -> np.ndarray:
+        """
+        RMS level of every frame in dBFS; the last partial frame is zero-padded.
+        """
+        n_frames = -(-len(audio) // self.frame_len)
+        frames = np.zeros(n_frames * self.frame_len, dtype=np.float32)
+        frames[:len(audio)] = audio
+        rms = np.sqrt(np.mean(frames.reshape(n_frames, self.frame_len) ** 2, axis=1))
+        return 20 * np.log10(rms + 1e-10)
+
+    def detect(self, audio: np.ndarray) -> List[Segment]:
+        """
+        Speech regions of ``audio`` as sample ranges, in order and non-overlapping.
+        """
+        if len(audio) == 0:
+            return []
+        levels = self.frame_levels(audio)
+        noise_floor = float(np.percentile(levels, 10))
+        # Cap the adaptive threshold below the peak, so a clip that is speech throughout is not trimmed away
+        threshold = max(self.threshold_db, min(noise_floor + self.noise_margin_db, float(levels.max()) - 20.0))
+        speech = levels > threshold
+
+        runs = []
+        start = None
+        for i, is_speech in enumerate(speech):
+            if is_speech and start is None:
+                start = i
+            elif not is_speech and start is not None:
+                runs.append([start, i])
+                start = None
+        if start is not None:
+            runs.append([start, len(speech)])
+
+        bridged = []
+        for run in runs:
+            if bridged and run[0] - bridged[-1][1] < self.min_silence_frames:
+                bridged[-1][1] = run[1]
+            else:
+                bridged.append(run)
+
+        segments: List[Segment] = []
+        for first, last in bridged:
+            if last - first < self.min_speech_frames:
+                continue
+            start = max(0, first * self.frame_len - self.padding)
+            end = min(len(audio), last * self.frame_len + self.padding)
+            if segments and start <= segments[-1][1]:
+                segments[-1] = (segments[-1][0], end)
+            else:
+                segments.append((start, end))
+        return segments
+
+    def split(self, audio: np.ndarray) -> List[Segment]:
+        """
+        Like detect, but every region fits in ``max_segment_s``, so each can be transcribed on its own.
+        """
+        segments = []
+        for start, end in self.detect(audio):
+            while end - start > self.max_segment:
+                # Cut at the quietest frame in the second half of the window
+                first = (start + self.max_segment // 2) // self.frame_len
+                last = (start + self.max_segment) // self.frame_len
+                levels = self.frame_levels(audio[first * self.frame_len:last * self.frame_len])
+                cut = (first + int(np.argmin(levels))) * self.frame_len
+                segments.append((start, cut))
+                start = cut
+            segments.append((start, end))
+        return segments
+
+    def report(self, audio: np.ndarray, segments: List[Segment]) -> Dict[str, Any]:
+        """
+        How much of ``audio`` the segments keep, in seconds.
+        """
+        audio_seconds = len(audio) / self.sample_rate
+        speech_seconds = sum(end - start for start, end in segments) / self.sample_rate
+        return {
+            "segments": len(segments),
+            "audio_seconds": audio_seconds,
+            "speech_seconds": speech_seconds,
+            "seconds_saved": audio_seconds - speech_seconds,
+        }
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+DEFAULT_AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a")
+
+
+def file_digest(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProcessedLedger:
+    """
+    Durable record of processed input files keyed by content hash, so a file
+    is handled once no matter how often it is renamed, touched or re-dropped.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            "content_hash TEXT PRIMARY KEY, path TEXT NOT NULL, output TEXT, processed_at REAL NOT NULL)"
+        )
+
+    def __contains__(self, content_hash: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM processed WHERE content_hash = ?", (content_hash,)).fetchone()
+        return row is not None
+
+    def record(self, content_hash: str, path: Union[str, Path], output: Optional[Union[str, Path]] = None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO processed (content_hash, path, output, processed_at) VALUES (?, ?, ?, ?)",
+                (content_hash, str(path), None if output is None else str(output), time.time())
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class _EnqueueHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "InputWatcher"):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.enqueue(Path(event.src_path))
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.enqueue(Path(event.dest_path))
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.enqueue(Path(event.src_path))
+
+
+class InputWatcher:
+    """
+    Watches a directory with watchdog and feeds new audio files to a job queue.
+    Worker threads block on the queue, so an idle watcher uses no CPU.
+    """
+
+    def __init__(self, input_dir: Union[str, Path], process: Callable[[Path], Optional[Path]],
+                 ledger: ProcessedLedger, extensions: Iterable[str] = DEFAULT_AUDIO_EXTENSIONS,
+                 workers: int = 1, settle_time: float = 0.5, stable_checks: int = 2, max_wait: float = 300.0):
+        """
+        :param input_dir: Directory to watch.
+        :param process: Called with each new file; its return value is stored in the ledger as the output.
+        :param ledger: Record of already processed files.
+        :param extensions: File extensions to pick up (case-insensitive, with leading dot).
+        :param workers: Number of files processed concurrently.
+        :param settle_time: Seconds between size checks while a file is being written.
+        :param stable_checks: Consecutive checks with an unchanged size after which a file counts as written.
+        :param max_wait: Seconds after which a file whose size never settles is skipped.
+        """
+        self.input_dir = Path(input_dir)
+        self.process = process
+        self.ledger = ledger
+        self.extensions = {e.lower() if e.startswith(".") else f".{e.lower()}" for e in extensions}
+        self.workers = workers
+        self.settle_time = settle_time
+        self.stable_checks = stable_checks
+        self.max_wait = max_wait
+
+        self.jobs = queue.Queue()
+        self.pending = set()
+        self.pending_lock = threading.Lock()
+        self.observer = None
+        self.threads = []
+
+    def enqueue(self, path: Path):
+        if path.suffix.lower() not in self.extensions:
+            return
+        with self.pending_lock:
+            if path in self.pending:
+                return
+            self.pending.add(path)
+        self.jobs.put(path)
+
+    def _wait_until_written(self, path: Path) -> bool:
+        """
+        Waits until the file's size has stopped changing. Returns False for files
+        that vanish, stay empty (writing them later re-queues them) or never
+        settle within max_wait, so one stuck file cannot block the queue.
+        """
+        deadline = time.monotonic() + self.max_wait
+        last_size, stable = -1, 0
+        while path.exists():
+            size = path.stat().st_size
+            stable = stable + 1 if size == last_size else 0
+            if stable >= self.stable_checks:
+                if size == 0:
+                    logging.info(f"Skipping empty file {path}")
+                    return False
+                return True
+            if time.monotonic() > deadline:
+                logging.warning(f"Skipping {path}: still changing after {self.max_wait:.0f}s")
+                return False
+            last_size = size
+            time.sleep(self.settle_time)
+        return False
+
+    def _work(self):
+        while True:
+            path = self.jobs.get()
+            if path is None:
+                break
+            try:
+                if not self._wait_until_written(path):
+                    continue
+                content_hash = file_digest(path)
+                if content_hash in self.ledger:
+                    logging.info(f"Skipping already processed file {path}")
+                    continue
+                output = self.process(path)
+                self.ledger.record(content_hash, path, output)
+            except Exception as e:
+                logging.error(f"Error processing {path}: {e}")
+            finally:
+                with self.pending_lock:
+                    self.pending.discard(path)
+                self.jobs.task_done()
+
+    def start(self):
+        self.threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+        self.observer = Observer()
+        self.observer.schedule(_EnqueueHandler(self), str(self.input_dir), recursive=False)
+        self.observer.start()
+
+        # Files dropped while the watcher was down; the ledger filters out the processed ones
+        for path in sorted(self.input_dir.iterdir()):
+            if path.is_file():
+                self.enqueue(path)
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()